@@ -9,6 +9,12 @@ Amazon ASINから楽天商品ページを自動生成するシステム
     python main.py batch        # バッチ処理版起動
     python main.py setup        # 初期セットアップ
     python main.py test         # システムテスト
+    python main.py bench        # 起動時間ベンチマーク
+    python main.py preview      # テンプレートプレビューサーバー
+    python main.py standin      # 商品データAPI代替サーバー（開発用）
+    python main.py report       # 実行履歴レポート
+    python main.py reprice      # 全商品の価格再計算
+    python main.py history      # 生成コンテンツの履歴・差分表示
 
 作成者: EC自動化システム開発チーム
 バージョン: 1.0.0
@@ -17,34 +23,44 @@ Amazon ASINから楽天商品ページを自動生成するシステム
 
 import sys
 import os
-import asyncio
 import argparse
 from pathlib import Path
-import json
 import csv
-from datetime import datetime
 import logging
 
 # プロジェクトルートをPythonパスに追加
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('rakuten_automation.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# モード別の起動時インポートと起動時間の予算（ミリ秒）
+# aiohttp・google-generativeai などの重いライブラリは実際に通信する処理の中で読み込む
+STARTUP_BUDGETS = {
+    'setup': (['main'], 150),
+    'samples': (['main'], 150),
+    'test': (['main', 'rakuten_gold_automation'], 300),
+    'cli': (['main', 'rakuten_gold_automation'], 300),
+}
+
+def configure_logging(verbose: bool = False):
+    """ログ設定（処理を実行するモードでのみ呼び出す）"""
+    from rakuten_gold_automation import PipelineLogManager
+    
+    # JSON Lines・サイズローテーション・DB書き込みはバックグラウンドスレッドで処理
+    PipelineLogManager(level=logging.DEBUG if verbose else logging.INFO).start()
+
 class RakutenAutomationCLI:
     """コマンドライン版インターフェース"""
     
-    def __init__(self):
+    def __init__(self, bundle_format: str = None, profiler=None, run_id: str = None):
         self.system = None
+        self.bundle_format = bundle_format
+        self.profiler = profiler
+        if run_id is None:
+            from rakuten_gold_automation import new_run_id
+            run_id = new_run_id()
+        self.run_id = run_id
         
     def init_system(self):
         """システム初期化"""
@@ -67,6 +83,7 @@ class RakutenAutomationCLI:
             
             from rakuten_gold_automation import RakutenGoldAutomationSystem
             self.system = RakutenGoldAutomationSystem()
+            self.system.profiler = self.profiler
             logger.info("✅ システム初期化完了")
             return True
             
@@ -80,7 +97,12 @@ class RakutenAutomationCLI:
             return
         
         print(f"🚀 ASIN処理開始: {asin}")
-        result = await self.system.process_asin(asin)
+        bundle = self.system.open_bundle(self.run_id, self.bundle_format) if self.bundle_format else None
+        try:
+            result = await self.system.process_asin(asin, bundle=bundle)
+        finally:
+            bundle_path = bundle.close() if bundle else None
+        self.system.record_run(self.run_id, [result])
         
         if result['success']:
             print(f"✅ 処理成功: {asin}")
@@ -90,6 +112,9 @@ class RakutenAutomationCLI:
             print(f"❌ 処理失敗: {asin}")
             print(f"   エラー: {result['message']}")
         
+        if bundle_path:
+            print(f"\n📦 バンドル: {bundle_path}")
+        
         return result
     
     async def process_asin_list(self, asin_list: list):
@@ -98,7 +123,8 @@ class RakutenAutomationCLI:
             return
         
         print(f"🚀 一括処理開始: {len(asin_list)}件")
-        results = await self.system.bulk_process_asins(asin_list)
+        results = await self.system.bulk_process_asins(asin_list, bundle_format=self.bundle_format,
+                                                       run_id=self.run_id)
         
         # 結果サマリー
         success_count = sum(1 for r in results if r['success'])
@@ -111,6 +137,9 @@ class RakutenAutomationCLI:
             status = "✅" if result['success'] else "❌"
             print(f"   {status} {result['asin']}: {result['message']}")
         
+        if results and results[0].get('bundle_path'):
+            print(f"\n📦 バンドル: {results[0]['bundle_path']}")
+        
         return results
     
     async def process_csv_file(self, csv_path: str):
@@ -138,6 +167,7 @@ def setup_system():
         "templates",
         "output/rakuten_pages", 
         "output/results",
+        "output/bundles",
         "input",
         "logs"
     ]
@@ -252,6 +282,9 @@ def create_sample_files():
 
 # Amazon Product Data API (第三者API)
 PRODUCT_DATA_API_KEY=your_product_data_api_key_here
+# オプション: APIのURLとバッチ取得の1リクエストあたりのASIN上限
+# PRODUCT_DATA_API_URL=https://api.productdata.com/v1
+# PRODUCT_DATA_BATCH_SIZE=100
 
 # Google Gemini AI API
 GEMINI_API_KEY=your_gemini_api_key_here
@@ -260,8 +293,17 @@ GEMINI_API_KEY=your_gemini_api_key_here
 RAKUTEN_SERVICE_SECRET=your_rakuten_service_secret_here
 RAKUTEN_LICENSE_KEY=your_rakuten_license_key_here
 
+# 価格ルール（カテゴリ別マージン帯・手数料・送料・端数・下限/上限のJSON。未設定時は20%マージン・円未満切り捨て）
+# 端数を揃える場合は "price_endings": [80, 98] のように指定
+# PRICING_RULES_PATH=pricing_rules.json
+
+# 日付別GOLDページをASINごとに残す件数（過去分はDBのコンテンツ履歴から参照、0で全て保持）
+# GOLD_PAGE_KEEP_FILES=3
+
 # オプション: Claude AI API (高度な分析用)
+# 設定時はGeminiの遅延・障害時にヘッジ・フォールバック先として使用
 CLAUDE_API_KEY=your_claude_api_key_here
+# CLAUDE_MODEL=claude-3-5-haiku-latest
 """
     
     with open(".env.example", "w", encoding="utf-8") as f:
@@ -272,7 +314,6 @@ CLAUDE_API_KEY=your_claude_api_key_here
     # requirements.txt作成
     requirements_content = """# 楽天GOLD自動化システム 必要ライブラリ
 aiohttp==3.9.3
-requests==2.31.0
 google-generativeai==0.3.2
 python-dotenv==1.0.1
 asyncio
@@ -282,6 +323,7 @@ tkinter
 
 # オプション（より高度な機能用）
 pandas==2.2.0
+pyarrow==15.0.0
 """
     
     with open("requirements.txt", "w", encoding="utf-8") as f:
@@ -289,6 +331,162 @@ pandas==2.2.0
     
     print("✅ requirements.txt作成完了")
 
+def measure_import_time(modules: list) -> float:
+    """新しいPythonプロセスで -X importtime を使いインポート時間(ms)を計測"""
+    import subprocess
+    
+    code = "; ".join(f"import {name}" for name in modules)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=str(project_root), capture_output=True, text=True, encoding='utf-8'
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    
+    # 出力形式: "import time: self [us] | cumulative | imported package"
+    # パッケージ名がインデントされていない行がトップレベルのインポート
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        if not fields[2].startswith('  '):
+            total_us += int(fields[1])
+    
+    return total_us / 1000
+
+def benchmark_startup(repeat: int = 5) -> bool:
+    """起動時間ベンチマーク（各モードのインポート時間が予算内か確認）"""
+    print("⏱️  起動時間ベンチマーク (-X importtime)")
+    print("=" * 50)
+    
+    all_ok = True
+    for mode, (modules, budget_ms) in STARTUP_BUDGETS.items():
+        # 初回はバイトコード生成を含むため除外し、残りの最小値を採用
+        measure_import_time(modules)
+        elapsed_ms = min(measure_import_time(modules) for _ in range(repeat))
+        
+        ok = elapsed_ms <= budget_ms
+        all_ok = all_ok and ok
+        status = "✅" if ok else "❌"
+        print(f"   {status} {mode:<8} {elapsed_ms:7.1f} ms (予算 {budget_ms} ms)")
+    
+    return all_ok
+
+def show_report(since: str = None):
+    """実行履歴レポート"""
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("❌ レポートには pandas が必要です (pip install pandas)")
+        return
+    
+    from rakuten_gold_automation import RunHistoryStore
+    
+    print("📈 実行履歴レポート" + (f" ({since} 以降)" if since else ""))
+    print("=" * 50)
+    
+    report = RunHistoryStore().report(since)
+    if not report['rows']:
+        print("履歴がありません (output/results/history)")
+        return
+    
+    print(f"   実行回数: {report['runs']}回")
+    print(f"   処理件数: {report['rows']}件 (ユニークASIN {report['unique_asins']}件)")
+    print(f"   成功率: {report['success_rate']:.1%}")
+    
+    print("\n🕒 ステージ別処理時間 (ms):")
+    print(report['timings'].round(1).to_string())
+    print("\n❌ エラー種別:")
+    print(report['errors'].to_string() if not report['errors'].empty else "   なし")
+    print("\n🗂️ カテゴリ別:")
+    print(report['by_category'].round(2).to_string())
+    print("\n📅 実行別 (直近10回):")
+    print(report['by_run'].tail(10).round(3).to_string())
+
+def reprice_catalog(dry_run: bool = False, push: bool = False):
+    """価格ルールで出品済みの全商品を再計算（push指定時は変更した価格を楽天RMSに反映）"""
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("❌ 価格再計算には pandas が必要です (pip install pandas)")
+        return
+    
+    import time
+    from rakuten_gold_automation import PricingRuleEngine
+    
+    db_path = "rakuten_automation.db"
+    if not Path(db_path).exists():
+        print(f"❌ {db_path} が見つかりません（先に商品を処理してください）")
+        return
+    
+    print("💴 価格再計算" + (" (ドライラン)" if dry_run else ""))
+    print("=" * 50)
+    
+    start = time.perf_counter()
+    changed = PricingRuleEngine().reprice_catalog(db_path, dry_run=dry_run)
+    elapsed = time.perf_counter() - start
+    
+    print(f"   価格変更: {len(changed)}件 ({elapsed:.2f}秒)")
+    if not changed.empty:
+        diff = changed['new_price'] - changed['old_price']
+        print(f"   値上げ: {(diff > 0).sum()}件 / 値下げ: {(diff < 0).sum()}件")
+        print("\n" + changed.head(20).to_string(index=False))
+    if dry_run:
+        print("\n※ ドライランのためデータベースは更新していません")
+        return
+    
+    if not push:
+        print("\n※ 楽天への反映は --push を指定して実行してください")
+        return
+    
+    import asyncio
+    from rakuten_gold_automation import RakutenGoldAutomationSystem
+    
+    system = RakutenGoldAutomationSystem()
+    counts = asyncio.run(system.sync_prices())
+    system.flush_db_writes()
+    print(f"\n🛒 楽天RMSへの反映: {counts['synced']}/{counts['pending']}件" +
+          (f"（失敗 {counts['failed']}件は次回 --push で再送）" if counts['failed'] else ""))
+
+def show_content_history(asin: str, kind: str = None):
+    """生成コンテンツ（タイトル・説明文・ページ）の履歴と直近の差分"""
+    from rakuten_gold_automation import ContentVersionStore
+    
+    db_path = "rakuten_automation.db"
+    if not Path(db_path).exists():
+        print(f"❌ {db_path} が見つかりません（先に商品を処理してください）")
+        return
+    
+    store = ContentVersionStore(db_path)
+    if not asin:
+        stats = store.stats()
+        ratio = stats['stored_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 0
+        print("🗃️ コンテンツストア")
+        print("=" * 50)
+        print(f"   ASIN数: {stats['asins']} / バージョン数: {stats['versions']} / 本文数: {stats['blobs']}")
+        print(f"   保存サイズ: {stats['stored_bytes']:,} bytes (元サイズ {stats['raw_bytes']:,} bytes, {ratio:.1%})")
+        return
+    
+    asin = asin.strip().upper()
+    history = store.history(asin, kind)
+    if not history:
+        print(f"履歴がありません: {asin}")
+        return
+    
+    print(f"🗃️ {asin} のコンテンツ履歴")
+    print("=" * 50)
+    for entry in history:
+        print(f"   {entry['created_at']}  {entry['kind']:<12} {entry['hash'][:12]}  "
+              f"{entry['raw_size']:>7,} → {entry['stored_size']:>6,} bytes")
+    
+    for content_kind in ([kind] if kind else ['title', 'description', 'page']):
+        if sum(1 for entry in history if entry['kind'] == content_kind) >= 2:
+            print(f"\n📝 {content_kind} の直近の変更:")
+            print(store.diff(asin, content_kind) or "   差分なし")
+
 def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(
@@ -299,28 +497,50 @@ def main():
   python main.py gui                          # GUI版起動
   python main.py cli --asin B07XJ8C8F5        # 単一ASIN処理
   python main.py cli --csv input/asins.csv    # CSVファイル処理
+  python main.py cli --csv input/asins.csv --bundle tar  # 生成ページをtar.gzに一括出力
+  python main.py cli --csv input/asins.csv --profile     # CPU/メモリプロファイルを output/results/ に出力
   python main.py setup                        # 初期セットアップ
   python main.py test                         # システムテスト
   python main.py samples                      # サンプルファイル作成
+  python main.py bench                        # 起動時間ベンチマーク
+  python main.py preview --port 8000          # テンプレートプレビュー（API呼び出しなし）
+  python main.py report --since 2025-08-01    # 実行履歴レポート
+  python main.py reprice --dry-run            # 価格ルール変更の影響確認（PRICING_RULES_PATH）
+  python main.py reprice --push               # 価格を再計算して楽天RMSに反映
+  python main.py history --asin B08N5WRWNW    # 生成コンテンツの履歴と直近の差分
+  python main.py standin --port 8100          # 商品データAPI代替サーバー
+                                              # (PRODUCT_DATA_API_URL=http://127.0.0.1:8100/v1 で接続)
         """
     )
     
-    parser.add_argument('mode', choices=['gui', 'cli', 'setup', 'test', 'samples'],
+    parser.add_argument('mode', choices=['gui', 'cli', 'setup', 'test', 'samples', 'bench', 'preview', 'standin', 'report',
+                                         'reprice', 'history'],
                        help='実行モード')
     parser.add_argument('--asin', type=str, help='処理するASIN')
     parser.add_argument('--asin-list', type=str, help='カンマ区切りのASINリスト')
     parser.add_argument('--csv', type=str, help='ASINリストCSVファイルパス')
+    parser.add_argument('--bundle', choices=['tar', 'zip'],
+                       help='一括処理の生成ページを1つのアーカイブにまとめる')
+    parser.add_argument('--profile', action='store_true',
+                       help='CPUプロファイル・flamegraph・tracemallocスナップショットを出力')
+    parser.add_argument('--since', type=str, help='レポート対象の開始日 (YYYY-MM-DD)')
+    parser.add_argument('--port', type=int, help='プレビュー/代替サーバーのポート')
+    parser.add_argument('--template', type=str, help='プレビューするテンプレートファイル')
+    parser.add_argument('--fixtures', type=str, help='代替サーバーで返す商品データJSON（省略時はダミー生成）')
+    parser.add_argument('--kind', choices=['title', 'description', 'page'], help='履歴表示するコンテンツ種別')
+    parser.add_argument('--dry-run', action='store_true', help='価格再計算の結果を表示のみ（DBを更新しない）')
+    parser.add_argument('--push', action='store_true', help='再計算で変更した価格を楽天RMSに反映')
     parser.add_argument('--verbose', '-v', action='store_true', help='詳細ログ出力')
     
     args = parser.parse_args()
     
-    # ログレベル設定
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
+    # ファイルログは実際に処理を行うモードでのみ設定
+    if args.mode in ('gui', 'cli', 'test', 'preview', 'standin', 'reprice'):
+        configure_logging(args.verbose)
     
-    # .env ファイル読み込み
+    # .env ファイル読み込み（APIキーを使うモードのみ）
     env_file = Path('.env')
-    if env_file.exists():
+    if args.mode in ('gui', 'cli', 'test', 'reprice') and env_file.exists():
         try:
             from dotenv import load_dotenv
             load_dotenv()
@@ -340,19 +560,38 @@ def main():
                 print("config_and_runner.py ファイルを確認してください")
         
         elif args.mode == 'cli':
+            import asyncio
+            
             print("💻 CLI版を起動しています...")
-            cli = RakutenAutomationCLI()
+            from rakuten_gold_automation import new_run_id
+            # 同じ秒に複数プロセスを起動しても履歴・プロファイル出力先が衝突しないID
+            run_id = new_run_id()
+            profiler = None
+            if args.profile:
+                from rakuten_gold_automation import RunProfiler
+                profiler = RunProfiler(Path("output/results") / run_id)
+            
+            cli = RakutenAutomationCLI(bundle_format=args.bundle, profiler=profiler, run_id=run_id)
             
             if args.asin:
-                asyncio.run(cli.process_single_asin(args.asin))
+                job = cli.process_single_asin(args.asin)
             elif args.asin_list:
                 asin_list = [asin.strip() for asin in args.asin_list.split(',')]
-                asyncio.run(cli.process_asin_list(asin_list))
+                job = cli.process_asin_list(asin_list)
             elif args.csv:
-                asyncio.run(cli.process_csv_file(args.csv))
+                job = cli.process_csv_file(args.csv)
             else:
                 print("❌ --asin, --asin-list, または --csv のいずれかを指定してください")
                 parser.print_help()
+                return
+            
+            if profiler:
+                profiler.start()
+            try:
+                asyncio.run(job)
+            finally:
+                if profiler:
+                    print(f"\n🔬 プロファイル出力: {profiler.stop()}")
         
         elif args.mode == 'setup':
             setup_system()
@@ -363,6 +602,35 @@ def main():
         elif args.mode == 'samples':
             create_sample_files()
         
+        elif args.mode == 'preview':
+            from rakuten_gold_automation import TemplatePreviewServer
+            
+            port = args.port or 8000
+            print(f"👀 プレビューサーバー: http://127.0.0.1:{port}/")
+            print("   テンプレートを保存すると表示中のページが自動で再描画されます (Ctrl+Cで終了)")
+            TemplatePreviewServer(template_path=args.template, port=port).serve_forever()
+        
+        elif args.mode == 'standin':
+            from rakuten_gold_automation import ProductDataStandInServer
+            
+            port = args.port or 8100
+            print(f"🧪 商品データAPI代替サーバー: http://127.0.0.1:{port}/v1")
+            print(f"   PRODUCT_DATA_API_URL=http://127.0.0.1:{port}/v1 を設定してCLIを実行してください")
+            ProductDataStandInServer(fixtures_path=args.fixtures, port=port).serve_forever()
+        
+        elif args.mode == 'report':
+            show_report(args.since)
+        
+        elif args.mode == 'reprice':
+            reprice_catalog(args.dry_run, args.push)
+        
+        elif args.mode == 'history':
+            show_content_history(args.asin, args.kind)
+        
+        elif args.mode == 'bench':
+            if not benchmark_startup():
+                sys.exit(1)
+        
     except KeyboardInterrupt:
         print("\n⏹️  ユーザーによって処理が中断されました")
     except Exception as e:
@@ -2,22 +2,524 @@
 # Rakuten GOLD Product Page Automation System
 
 import os
+import abc
+import sys
+import io
+import html
+import re
 import json
-import requests
 import asyncio
-import aiohttp
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, AsyncIterator, Tuple
 import csv
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 import sqlite3
 import logging
+import hashlib
+import zlib
+import uuid
+import tempfile
+import threading
+import time
+import queue
+import atexit
+import contextlib
+import contextvars
+import concurrent.futures
+import copy
+import logging.handlers
+from collections import deque
 
-# ログ設定
-logging.basicConfig(level=logging.INFO)
+# ログ設定（ハンドラ構成は呼び出し側の main.py / __main__ で行う）
 logger = logging.getLogger(__name__)
 
+# 構造化ログで出力する追加フィールド（logger.xxx(..., extra={...}) で指定）
+STRUCTURED_LOG_FIELDS = ('asin', 'stage', 'status', 'duration_ms')
+
+class JsonLineFormatter(logging.Formatter):
+    """JSON Lines形式のログフォーマッタ"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in STRUCTURED_LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        # キュー経由のレコードはリスナー側で exc_info を持たないため整形済みの exc_text を使う
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class PipelineQueueHandler(logging.handlers.QueueHandler):
+    """キュー投入ハンドラ（メッセージと例外トレースを分けたままリスナーに渡す）"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 標準の prepare はトレースバックを message に連結して exc_info を消すため、
+        # 引数の埋め込みと例外の文字列化だけを行う
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class AuditRecordFilter(logging.Filter):
+    """監査専用レコード（automation_log向け）をファイル・コンソールに出さないフィルタ"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, 'audit_only', False)
+
+class DebugSamplingFilter(logging.Filter):
+    """大量のDEBUGログを呼び出し箇所ごとに間引くフィルタ"""
+    
+    def __init__(self, sample_every: int = 100):
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self._counters: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counters.get(key, 0)
+            self._counters[key] = count + 1
+        return count % self.sample_every == 0
+
+class SQLiteLogHandler(logging.Handler):
+    """automation_logテーブルへの書き込みハンドラ（ログリスナースレッドで実行）"""
+    
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def emit(self, record: logging.LogRecord):
+        if not getattr(record, 'db_log', False):
+            return
+        
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                INSERT INTO automation_log (asin, action, status, message)
+                VALUES (?, ?, ?, ?)
+            """, (record.asin, record.stage, record.status, getattr(record, 'db_message', record.getMessage())))
+            self._conn.commit()
+        except Exception:
+            self.handleError(record)
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        super().close()
+
+class PipelineLogManager:
+    """非同期ログ管理（QueueHandler + バックグラウンドリスナー）"""
+    
+    _active: Optional['PipelineLogManager'] = None
+    
+    def __init__(self, log_file: str = 'rakuten_automation.log', level: int = logging.INFO,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 debug_sample_every: int = 100, console: bool = True):
+        self.log_file = log_file
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.debug_sample_every = debug_sample_every
+        self.console = console
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._queue_handler: Optional[logging.handlers.QueueHandler] = None
+        self._queue: Optional[queue.SimpleQueue] = None
+        self._db_paths = set()
+    
+    @classmethod
+    def active(cls) -> Optional['PipelineLogManager']:
+        """起動中のログマネージャを取得"""
+        return cls._active
+    
+    def start(self) -> 'PipelineLogManager':
+        """ルートロガーをキュー経由に切り替えてリスナーを起動"""
+        if PipelineLogManager._active is not None:
+            return PipelineLogManager._active
+        
+        file_handler = logging.handlers.RotatingFileHandler(
+            self.log_file, maxBytes=self.max_bytes,
+            backupCount=self.backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonLineFormatter())
+        file_handler.addFilter(AuditRecordFilter())
+        handlers = [file_handler]
+        
+        if self.console:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(self.level)
+            console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            console_handler.addFilter(AuditRecordFilter())
+            handlers.append(console_handler)
+        
+        # 呼び出し側はキューに積むだけ。フォーマット・ファイル/DB書き込みはリスナースレッドで行う
+        log_queue = queue.SimpleQueue()
+        self._queue = log_queue
+        self._queue_handler = PipelineQueueHandler(log_queue)
+        self._queue_handler.addFilter(DebugSamplingFilter(self.debug_sample_every))
+        
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self._queue_handler)
+        root.setLevel(self.level)
+        
+        self.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        
+        PipelineLogManager._active = self
+        atexit.register(self.stop)
+        return self
+    
+    def attach_database(self, db_path: str):
+        """automation_logへの書き込みをリスナースレッドに追加"""
+        if not self.listener or db_path in self._db_paths:
+            return
+        
+        self._db_paths.add(db_path)
+        # handlersはリスナースレッドが参照するタプルなので差し替えで追加する
+        self.listener.handlers = self.listener.handlers + (SQLiteLogHandler(db_path),)
+    
+    def audit(self, asin: str, action: str, status: str, message: str):
+        """automation_logへの記録（ロガーのレベル・伝播設定に関係なくリスナーのDBハンドラへ渡す）"""
+        record = logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.INFO, 'levelname': 'INFO', 'msg': message,
+            'asin': asin, 'stage': action, 'status': status,
+            'db_log': True, 'audit_only': True, 'db_message': message,
+        })
+        if self._queue is not None:
+            self._queue.put_nowait(record)
+    
+    def stop(self):
+        """キューに残ったログを書き出してリスナーを停止"""
+        if not self.listener:
+            return
+        
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        logging.getLogger().removeHandler(self._queue_handler)
+        self.listener = None
+        if PipelineLogManager._active is self:
+            PipelineLogManager._active = None
+
+# 処理の優先度クラスと重み（重みが大きいほど上流APIの枠を多く割り当てる）
+PRIORITY_WEIGHTS = {
+    'interactive': 16,  # 画面・CLIからの単一ASIN処理
+    'bulk': 4,          # CSV等の一括処理
+    'background': 1,    # 定期再同期などのバックグラウンド処理
+}
+
+class ExecutionPriority:
+    """1回の処理の優先度（より優先度の高い呼び出し元が合流したら実行途中でも引き上げる）"""
+    
+    def __init__(self, name: str = 'interactive'):
+        self.name = name
+        # スケジューラで待機中の枠（引き上げ時に上位クラスのキューへ移す）
+        self._waiting: Dict[asyncio.Future, 'PriorityScheduler'] = {}
+    
+    def promote(self, name: str) -> bool:
+        """優先度を引き上げ（下げることはしない）"""
+        if PRIORITY_WEIGHTS.get(name, 0) <= PRIORITY_WEIGHTS.get(self.name, 0):
+            return False
+        previous, self.name = self.name, name
+        for waiter, scheduler in list(self._waiting.items()):
+            scheduler.requeue(waiter, previous, name)
+        logger.debug(f"優先度を引き上げ: {previous} → {name}")
+        return True
+
+# 現在の処理の優先度（process_asinで設定し、各APIクライアントのスケジューラが参照）
+current_priority: contextvars.ContextVar = contextvars.ContextVar('current_priority', default=ExecutionPriority())
+
+class SlotOutcome:
+    """枠内で行ったAPI呼び出しの結果（HTTPステータスを同時実行数制御に伝える）"""
+    
+    __slots__ = ('status', 'error')
+    
+    def __init__(self):
+        self.status: Optional[int] = None
+        # 枠内で例外を握りつぶす呼び出し側はここに設定する
+        self.error: Optional[BaseException] = None
+
+class _NoSlot:
+    """スケジューラ未設定時の何もしないコンテキスト"""
+    
+    async def __aenter__(self):
+        return SlotOutcome()
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+NO_SLOT = _NoSlot()
+
+class PriorityScheduler:
+    """上流APIの同時実行枠を優先度クラス間で重み付き公平配分するスケジューラ（待ち時間によるエージング付き）
+    
+    枠はこのプロセス内でのみ共有される。別々に起動したCLIプロセス同士（単一ASIN処理と別プロセスのCSV一括処理）は
+    互いの枠を見ないため、単一ASIN処理を一括処理より優先させるには同じプロセス（GUI等）から両方を実行する。
+    """
+    
+    def __init__(self, name: str, capacity: int, weights: Dict[str, int] = None,
+                 aging_per_sec: float = 0.05):
+        self.name = name
+        self.capacity = capacity
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self.aging_per_sec = aging_per_sec
+        self._queues: Dict[str, deque] = {cls: deque() for cls in self.weights}
+        self._pass: Dict[str, float] = {cls: 0.0 for cls in self.weights}
+        self._virtual_time = 0.0
+        self._active = 0
+        self._granted: Dict[str, int] = {cls: 0 for cls in self.weights}
+        self._wait_total: Dict[str, float] = {cls: 0.0 for cls in self.weights}
+        # AdaptiveConcurrencyController を設定すると枠ごとの結果から capacity を自動調整
+        self.controller: Optional['AdaptiveConcurrencyController'] = None
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: str = None):
+        """枠を確保して処理を実行（呼び出し側は outcome.status にHTTPステータスを設定）"""
+        await self.acquire(priority)
+        outcome = SlotOutcome()
+        start = time.monotonic()
+        error: Optional[BaseException] = None
+        try:
+            yield outcome
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if self.controller and not isinstance(error, asyncio.CancelledError):
+                self.controller.record(time.monotonic() - start, outcome.status, outcome.error or error)
+            self.release()
+    
+    async def acquire(self, priority: str = None):
+        """枠の確保（空きがなければ優先度キューで待機）"""
+        execution = None
+        if priority is None:
+            execution = current_priority.get()
+            priority = execution.name
+        if priority not in self._queues:
+            priority = 'bulk'
+        
+        if self._active < self.capacity and not any(self._queues.values()):
+            self._grant(priority, 0.0)
+            return
+        
+        queue_ = self._queues[priority]
+        if not queue_:
+            # 休止していたクラスが貯めた分で他クラスを締め出さないよう現在の仮想時刻に揃える
+            self._pass[priority] = max(self._pass[priority], self._virtual_time)
+        
+        waiter = asyncio.get_running_loop().create_future()
+        queue_.append((time.monotonic(), waiter))
+        if execution is not None:
+            execution._waiting[waiter] = self
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 枠を割り当てられた直後にキャンセルされた場合は返却
+                self.release()
+            else:
+                # 待機中に優先度が引き上げられていれば移動先のキューから外す
+                for queue_ in self._queues.values():
+                    entry = next((item for item in queue_ if item[1] is waiter), None)
+                    if entry:
+                        queue_.remove(entry)
+                        break
+            raise
+        finally:
+            if execution is not None:
+                execution._waiting.pop(waiter, None)
+    
+    def requeue(self, waiter: asyncio.Future, previous: str, priority: str):
+        """待機中の枠を別の優先度クラスのキューへ移す（待ち始めた時刻は引き継ぐ）"""
+        source = self._queues.get(previous)
+        entry = next((item for item in source if item[1] is waiter), None) if source else None
+        if entry is None or priority not in self._queues:
+            return
+        source.remove(entry)
+        if not self._queues[priority]:
+            self._pass[priority] = max(self._pass[priority], self._virtual_time)
+        self._queues[priority].append(entry)
+    
+    def release(self):
+        """枠の返却"""
+        self._active -= 1
+        self._dispatch()
+    
+    def set_capacity(self, capacity: int):
+        """同時実行数の変更"""
+        self.capacity = max(1, capacity)
+        self._dispatch()
+    
+    def saturated(self) -> bool:
+        """枠を使い切っている、または待機中の処理がある"""
+        return self._active >= self.capacity or any(self._queues.values())
+    
+    def stats(self) -> Dict[str, Any]:
+        """スケジューラの状態"""
+        stats = {
+            'capacity': self.capacity,
+            'active': self._active,
+            'waiting': {cls: len(q) for cls, q in self._queues.items()},
+            'granted': dict(self._granted),
+            'avg_wait_ms': {
+                cls: round(self._wait_total[cls] / self._granted[cls] * 1000, 1) if self._granted[cls] else 0.0
+                for cls in self.weights
+            }
+        }
+        if self.controller:
+            stats['adaptive'] = self.controller.stats()
+        return stats
+    
+    def _dispatch(self):
+        """空き枠を待機中の処理に割り当て"""
+        while self._active < self.capacity:
+            priority = self._pick()
+            if priority is None:
+                return
+            
+            enqueued_at, waiter = self._queues[priority].popleft()
+            if waiter.done():
+                continue
+            self._grant(priority, time.monotonic() - enqueued_at)
+            waiter.set_result(None)
+    
+    def _pick(self) -> Optional[str]:
+        """次に枠を割り当てるクラス（パス値が最小、長く待っている先頭ほど有利）"""
+        now = time.monotonic()
+        best, best_score = None, None
+        for priority, queue_ in self._queues.items():
+            if not queue_:
+                continue
+            score = self._pass[priority] - (now - queue_[0][0]) * self.aging_per_sec
+            if best_score is None or score < best_score:
+                best, best_score = priority, score
+        return best
+    
+    def _grant(self, priority: str, waited: float):
+        """枠の割り当て記録（ストライドスケジューリング）"""
+        self._active += 1
+        self._virtual_time = max(self._virtual_time, self._pass[priority])
+        self._pass[priority] += 1.0 / self.weights[priority]
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+
+class AdaptiveConcurrencyController:
+    """AIMD方式の同時実行数制御（レイテンシ安定時は加算で増やし、遅延悪化・タイムアウト・429/5xxで半減）"""
+    
+    def __init__(self, scheduler: PriorityScheduler, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0,
+                 fast_alpha: float = 0.3, slow_alpha: float = 0.02, cooldown: float = 1.0):
+        self.scheduler = scheduler
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.cooldown = cooldown
+        
+        # 整数の capacity に対して小数で加算し、capacity 1つ分の成功で +1 になるようにする
+        self.limit = float(min(max(scheduler.capacity, min_limit), max_limit))
+        self.recent_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.last_reason = ''
+        scheduler.controller = self
+        scheduler.set_capacity(int(self.limit))
+    
+    def record(self, latency: float, status: Optional[int] = None, error: BaseException = None):
+        """1回の呼び出し結果を反映"""
+        reason = self._overload_reason(status, error)
+        if reason is None and error is None:
+            self.recent_latency = self._ewma(self.recent_latency, latency, self.fast_alpha)
+            self.baseline_latency = self._ewma(self.baseline_latency, latency, self.slow_alpha)
+            if self.recent_latency > self.baseline_latency * self.latency_tolerance:
+                reason = 'latency'
+        
+        if reason:
+            self._decrease(reason)
+        elif error is None and self.scheduler.saturated():
+            # 枠を使い切っているときだけ増やす（使われていない上限を膨らませない）
+            self._apply(self.limit + 1 / self.limit, 'increase')
+    
+    def stats(self) -> Dict[str, Any]:
+        """制御状態"""
+        return {
+            'limit': int(self.limit),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'recent_ms': round(self.recent_latency * 1000, 1) if self.recent_latency is not None else None,
+            'baseline_ms': round(self.baseline_latency * 1000, 1) if self.baseline_latency is not None else None,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'last_reason': self.last_reason,
+        }
+    
+    @staticmethod
+    def _overload_reason(status: Optional[int], error: BaseException = None) -> Optional[str]:
+        """過負荷を示す結果かどうか"""
+        if isinstance(error, asyncio.TimeoutError):
+            return 'timeout'
+        if status is None and error is not None:
+            # aiohttp の ClientResponseError.status / google-api-core の例外の code
+            code = getattr(error, 'status', None) or getattr(error, 'code', None)
+            status = code if isinstance(code, int) else None
+        if status == 429:
+            return 'http_429'
+        if status is not None and status >= 500:
+            return f'http_{status}'
+        return None
+    
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float, alpha: float) -> float:
+        return sample if current is None else current + alpha * (sample - current)
+    
+    def _decrease(self, reason: str):
+        """乗算で減らす（同時に返ってきた失敗で何度も半減しないようクールダウンを置く）"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        # 減らした後の遅延を新しい基準にして、悪化が続く間だけ減らし続ける
+        self.baseline_latency = self.recent_latency
+        self._apply(self.limit * self.decrease_factor, reason)
+    
+    def _apply(self, limit: float, reason: str):
+        previous = int(self.limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        if int(self.limit) == previous:
+            return
+        
+        if int(self.limit) > previous:
+            self.increases += 1
+        else:
+            self.decreases += 1
+            self.last_reason = reason
+            logger.info(f"同時実行数を縮小 ({self.scheduler.name}): {previous} → {int(self.limit)} ({reason})")
+        self.scheduler.set_capacity(int(self.limit))
+
 @dataclass
 class ProductInfo:
     """商品情報データクラス"""
@@ -46,12 +548,21 @@ class RakutenProductData:
 class AmazonDataCollector:
     """Amazon商品データ収集システム"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None,
+                 max_batch_size: int = None, prefetch_chunks: int = 4):
         self.api_key = api_key or os.getenv('PRODUCT_DATA_API_KEY')
-        self.base_url = "https://api.productdata.com/v1"
+        self.base_url = (base_url or os.getenv('PRODUCT_DATA_API_URL') or "https://api.productdata.com/v1").rstrip('/')
+        # 1リクエストあたりのASIN上限（プロバイダーの制限に合わせる）
+        self.max_batch_size = max_batch_size or int(os.getenv('PRODUCT_DATA_BATCH_SIZE', '100'))
+        # 消費側より先に取得しておくチャンク数の下限（取得済みデータが処理時点で古くならないよう制限）
+        self.prefetch_chunks = prefetch_chunks
+        self.scheduler: Optional[PriorityScheduler] = None
         
     async def fetch_product_data(self, asin: str) -> Optional[ProductInfo]:
         """ASIN から商品データを取得"""
+        # aiohttpはネットワーク処理を行うときだけ読み込む（CLI起動の高速化）
+        import aiohttp
+        
         try:
             async with aiohttp.ClientSession() as session:
                 headers = {
@@ -60,18 +571,137 @@ class AmazonDataCollector:
                 }
                 
                 url = f"{self.base_url}/products/{asin}"
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_amazon_data(data)
-                    else:
-                        logger.error(f"API request failed: {response.status}")
-                        return None
+                async with self.scheduler.slot() if self.scheduler else NO_SLOT as outcome:
+                    async with session.get(url, headers=headers) as response:
+                        outcome.status = response.status
+                        if response.status == 200:
+                            data = await response.json()
+                            return self._parse_amazon_data(data)
+                        else:
+                            logger.error(f"API request failed: {response.status}")
+                            return None
                         
         except Exception as e:
             logger.error(f"Error fetching product data: {e}")
             return None
     
+    async def fetch_products_bulk(self, asins: List[str]) -> Tuple[Dict[str, ProductInfo], Dict[str, str]]:
+        """複数ASINを一括取得 (取得できた商品, 取得できなかったASINと理由)"""
+        products: Dict[str, ProductInfo] = {}
+        misses: Dict[str, str] = {}
+        
+        async for asin, product, error in self.iter_products(asins):
+            if product:
+                products[asin] = product
+            else:
+                misses[asin] = error
+        
+        logger.info(f"一括取得完了: 成功{len(products)}件 / 失敗{len(misses)}件")
+        return products, misses
+    
+    async def iter_products(self, asins: List[str]) -> AsyncIterator[Tuple[str, Optional[ProductInfo], Optional[str]]]:
+        """複数ASINをチャンク単位でバッチ取得し、届いた順に (asin, 商品 or None, エラー理由) を返す
+        
+        未消費のチャンクは prefetch_chunks 件（スケジューラの枠がそれより広ければ枠の数）までで、
+        消費側がチャンクを読み終えるごとに次のチャンクを取得する。同時リクエスト数はスケジューラの枠で制御される。
+        """
+        import aiohttp
+        
+        unique_asins = list(dict.fromkeys(a.strip().upper() for a in asins if a.strip()))
+        chunks = [unique_asins[i:i + self.max_batch_size]
+                  for i in range(0, len(unique_asins), self.max_batch_size)]
+        if not chunks:
+            return
+        
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async with aiohttp.ClientSession() as session:
+            async def run_chunk(chunk: List[str]):
+                # 結果を返し終えたASINは _fetch_chunk が取り除く（途中で失敗しても返却済みのASINは再報告しない）
+                pending = set(chunk)
+                async with self.scheduler.slot() if self.scheduler else NO_SLOT as outcome:
+                    try:
+                        outcome.status = await self._fetch_chunk(session, chunk, pending, results)
+                    except Exception as e:
+                        outcome.error = e
+                        logger.error(f"Batch request error: {e} (未取得 {len(pending)}件)")
+                        for asin in chunk:
+                            if asin in pending:
+                                await results.put((asin, None, f"batch_error: {e}"))
+                    finally:
+                        await results.put(None)  # チャンク完了の目印
+            
+            tasks: List[asyncio.Task] = []
+            finished = 0
+            
+            def fill():
+                # 同時実行数制御で枠が広がれば先読みも増やす
+                window = max(1, self.prefetch_chunks, self.scheduler.capacity if self.scheduler else 0)
+                while len(tasks) < len(chunks) and len(tasks) - finished < window:
+                    tasks.append(asyncio.ensure_future(run_chunk(chunks[len(tasks)])))
+            
+            fill()
+            try:
+                while finished < len(chunks):
+                    item = await results.get()
+                    if item is None:
+                        finished += 1
+                        # 1チャンク分を消費し終えたら次のチャンクを取得開始
+                        fill()
+                    else:
+                        yield item
+            finally:
+                for task in tasks:
+                    task.cancel()
+    
+    async def _fetch_chunk(self, session, chunk: List[str], pending: set, results: asyncio.Queue) -> int:
+        """1チャンク分のバッチ取得（NDJSONを1行ずつパース、HTTPステータスを返す）
+        
+        pending: 未報告のASIN。結果キューに入れたASINから取り除く
+        """
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/x-ndjson, application/json'
+        }
+        
+        url = f"{self.base_url}/products/batch"
+        async with session.post(url, headers=headers, json={'asins': chunk}) as response:
+            if response.status != 200:
+                logger.error(f"Batch request failed: {response.status} ({len(chunk)}件)")
+                for asin in chunk:
+                    pending.discard(asin)
+                    await results.put((asin, None, f"batch_http_{response.status}"))
+                return response.status
+            
+            if 'ndjson' in response.headers.get('Content-Type', ''):
+                async for line in response.content:
+                    line = line.strip()
+                    if line:
+                        await self._put_batch_item(json.loads(line), pending, results)
+            else:
+                data = await response.json()
+                for item in data.get('products', []) + data.get('errors', []):
+                    await self._put_batch_item(item, pending, results)
+        
+        # レスポンスに含まれなかったASINは個別に未取得として報告
+        for asin in chunk:
+            if asin in pending:
+                pending.discard(asin)
+                await results.put((asin, None, "not_returned"))
+        return response.status
+    
+    async def _put_batch_item(self, item: Dict, pending: set, results: asyncio.Queue):
+        """バッチレスポンスの1件を結果キューに追加"""
+        asin = str(item.get('asin', '')).upper()
+        if asin not in pending:
+            return
+        
+        # パースに失敗したASINは未報告のまま残し、呼び出し元で失敗として報告させる
+        entry = (asin, None, str(item['error'])) if item.get('error') else (asin, self._parse_amazon_data(item), None)
+        pending.discard(asin)
+        await results.put(entry)
+    
     def _parse_amazon_data(self, data: Dict) -> ProductInfo:
         """Amazon APIレスポンスをパース"""
         return ProductInfo(
@@ -111,22 +741,418 @@ class RakutenCategoryMapper:
         """Amazon カテゴリから楽天カテゴリIDを取得"""
         return self.mapping_db.get(amazon_category, '100804')  # デフォルト: 日用品
 
+def ensure_price_columns(conn: sqlite3.Connection):
+    """processed_products に販売価格・楽天反映待ちフラグの列を追加（既存DBの移行）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(processed_products)")}
+    if 'rakuten_price' not in columns:
+        conn.execute("ALTER TABLE processed_products ADD COLUMN rakuten_price INTEGER")
+    if 'price_pending' not in columns:
+        conn.execute("ALTER TABLE processed_products ADD COLUMN price_pending INTEGER DEFAULT 0")
+    conn.commit()
+
+class PricingRuleEngine:
+    """価格ルールエンジン（カテゴリ別マージン帯・手数料・送料・価格帯丸め・下限/上限をNumPyで一括計算）"""
+    
+    DEFAULT_RULES = {
+        'default': {
+            # [仕入れ価格の下限, マージン率] を昇順に並べる
+            'margin_tiers': [[0, 0.20]],
+            'fee_rate': 0.0,
+            'shipping': 0,
+            'floor': 0,
+            'ceiling': None,
+        },
+        'categories': {},
+        # 例: [80, 98] で端数を ¥x80 / ¥x98 のうち計算価格以上で最も近い価格に切り上げ（空なら円未満を切り捨て）
+        'price_endings': [],
+    }
+    PARAMS = ('fee_rate', 'shipping', 'floor', 'ceiling')
+    
+    def __init__(self, rules: Dict[str, Any] = None):
+        if rules is None:
+            rules_path = os.getenv('PRICING_RULES_PATH')
+            rules = self.load_rules(rules_path) if rules_path else {}
+        
+        default = dict(self.DEFAULT_RULES['default'], **rules.get('default', {}))
+        self.default = default
+        # カテゴリ設定は未指定の項目を default から引き継ぐ
+        self.categories = {
+            category: dict(default, **overrides) for category, overrides in rules.get('categories', {}).items()
+        }
+        self.price_endings = rules.get('price_endings', self.DEFAULT_RULES['price_endings'])
+    
+    @staticmethod
+    def load_rules(path: str) -> Dict[str, Any]:
+        """JSONファイルから価格ルールを読み込み"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def price(self, cost: float, category: str = '') -> int:
+        """単一商品の販売価格（一括計算と同じロジックを使用）"""
+        return int(self.evaluate([cost], [category])[0])
+    
+    def evaluate(self, costs, categories):
+        """仕入れ価格とカテゴリの配列から販売価格の配列を計算"""
+        import numpy as np
+        
+        costs = np.asarray(costs, dtype=np.float64)
+        categories = np.asarray(categories, dtype=object)
+        
+        margin = np.empty_like(costs)
+        params = {name: np.empty_like(costs) for name in self.PARAMS}
+        
+        # ルールはカテゴリ単位でまとめて適用（カテゴリ数は商品数よりはるかに少ない）
+        unknown = np.ones(len(costs), dtype=bool)
+        groups = [(self.categories[c], categories == c) for c in self.categories]
+        for rule, mask in groups:
+            unknown &= ~mask
+        groups.append((self.default, unknown))
+        
+        for rule, mask in groups:
+            if not mask.any():
+                continue
+            tiers = np.asarray(sorted(rule['margin_tiers']), dtype=np.float64)
+            tier_index = np.searchsorted(tiers[:, 0], costs[mask], side='right') - 1
+            margin[mask] = tiers[np.clip(tier_index, 0, None), 1]
+            for name in self.PARAMS:
+                value = rule.get(name)
+                params[name][mask] = np.inf if (name == 'ceiling' and value is None) else (value or 0)
+        
+        # 手数料は販売価格に対する率なので割り戻して上乗せ
+        raw = (costs * (1 + margin) + params['shipping']) / (1 - params['fee_rate'])
+        prices = self._round_to_endings(raw)
+        prices = np.clip(prices, params['floor'], params['ceiling'])
+        
+        # 仕入れ価格が不正な商品は価格を付けない
+        prices = np.where(np.isfinite(costs) & (costs > 0), prices, 0)
+        return prices.astype(np.int64)
+    
+    def _round_to_endings(self, raw):
+        """下2桁を指定の端数のうち計算価格以上で最小のものに切り上げ（端数指定なしは従来どおり切り捨て）"""
+        import numpy as np
+        
+        raw = np.nan_to_num(raw, nan=0.0, posinf=0.0)
+        if not self.price_endings:
+            return np.floor(raw)
+        
+        raw = np.ceil(raw)
+        hundreds = np.floor(raw / 100) * 100
+        candidates = []
+        for ending in self.price_endings:
+            candidate = hundreds + ending
+            candidates.append(np.where(candidate < raw, candidate + 100, candidate))
+        return np.min(candidates, axis=0)
+    
+    def reprice_catalog(self, db_path: str, dry_run: bool = False, chunk_size: int = 100000):
+        """出品済みの全商品を再計算し、変更分を processed_products に書き戻す（楽天への反映待ちにする）
+        
+        仕入れ価格・カテゴリは商品スナップショットから読み、現在の販売価格は processed_products と比較する。
+        """
+        import pandas as pd
+        
+        conn = sqlite3.connect(db_path)
+        try:
+            ensure_price_columns(conn)
+            df = pd.read_sql_query("""
+                SELECT p.asin,
+                       json_extract(s.product_json, '$.category') AS category,
+                       json_extract(s.product_json, '$.price') AS cost,
+                       COALESCE(p.rakuten_price, json_extract(s.rakuten_json, '$.item_price')) AS old_price
+                FROM processed_products p
+                JOIN product_snapshots s ON s.asin = p.asin
+                WHERE p.status = 'completed'
+            """, conn)
+            
+            df['category'] = df['category'].fillna('')
+            df['cost'] = pd.to_numeric(df['cost'], errors='coerce')
+            df['old_price'] = pd.to_numeric(df['old_price'], errors='coerce').fillna(0).astype('int64')
+            df['new_price'] = self.evaluate(df['cost'].to_numpy(), df['category'].to_numpy())
+            changed = df[df['new_price'] != df['old_price']]
+            
+            if not dry_run and not changed.empty:
+                # 1トランザクションで一括更新（チャンク単位でexecutemany）
+                with conn:
+                    for start in range(0, len(changed), chunk_size):
+                        chunk = changed.iloc[start:start + chunk_size]
+                        conn.executemany("""
+                            UPDATE processed_products
+                            SET rakuten_price = ?, price_pending = 1, updated_at = CURRENT_TIMESTAMP
+                            WHERE asin = ?
+                        """, zip(chunk['new_price'].tolist(), chunk['asin'].tolist()))
+        finally:
+            conn.close()
+        
+        logger.info(f"再価格計算: {len(df)}件中 {len(changed)}件の価格を{'変更予定' if dry_run else '更新'}")
+        return changed.reset_index(drop=True)
+
+class PromptBuilder:
+    """AIプロンプト用の商品情報圧縮（重複除去・フィールド別トークン予算）"""
+    
+    DEFAULT_BUDGETS = {
+        'title': 80,
+        'title_features': 60,
+        'description': 600,
+        'features': 400,
+        'specifications': 300,
+    }
+    SENTENCE_SPLIT_RE = re.compile(r'(?<=[。．！？.!?])\s*|\n+')
+    NORMALIZE_RE = re.compile(r'[\s\W_]+', re.UNICODE)
+    
+    def __init__(self, budgets: Dict[str, int] = None):
+        self.budgets = dict(self.DEFAULT_BUDGETS, **(budgets or {}))
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """トークン数の概算（日本語は1文字≒1トークン、英数字は4文字≒1トークン）"""
+        if not text:
+            return 0
+        ascii_chars = sum(1 for c in text if ord(c) < 128)
+        return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+    
+    def truncate(self, text: str, budget: int) -> str:
+        """予算内に収まるよう文の区切りを優先して切り詰め"""
+        if self.estimate_tokens(text) <= budget:
+            return text
+        
+        # 末尾の「…」分を残して予算ぎりぎりの位置を探す
+        tokens = 0.0
+        cut = 0
+        for i, c in enumerate(text):
+            tokens += 1 if ord(c) >= 128 else 0.25
+            if tokens > budget - 1:
+                break
+            cut = i + 1
+        
+        head = text[:cut]
+        boundary = max(head.rfind(p) for p in '。．！？.!?\n')
+        if boundary >= cut * 0.6:
+            return head[:boundary + 1].rstrip()
+        return head.rstrip() + "…"
+    
+    def compact(self, product: ProductInfo) -> Dict[str, str]:
+        """説明・特徴・仕様の重複を除いて予算内に圧縮"""
+        features = self.unique(product.features)
+        normalized_features = [self._normalize(f) for f in features]
+        
+        # 特徴と重複する説明文の文は落とす（特徴の方が簡潔なため）
+        sentences = []
+        seen = set()
+        for sentence in self.SENTENCE_SPLIT_RE.split(product.description or ""):
+            key = self._normalize(sentence)
+            if not key or key in seen or any(key in f for f in normalized_features):
+                continue
+            seen.add(key)
+            sentences.append(sentence.strip())
+        description = "".join(
+            s if s[-1:] in '。．！？' else s + " " for s in sentences
+        ).strip()
+        
+        # 残った説明文に丸ごと含まれる特徴も落とす
+        normalized_description = self._normalize(description)
+        features = [f for f, key in zip(features, normalized_features) if key not in normalized_description]
+        
+        spec_lines = [
+            f"{key}: {value}" for key, value in (product.specifications or {}).items()
+            if str(value).strip()
+        ]
+        
+        return {
+            'title': self.truncate(product.title or "", self.budgets['title']),
+            'description': self.truncate(description, self.budgets['description']),
+            'features': self.fit_items(features, self.budgets['features'], ", "),
+            'specifications': self.fit_items(spec_lines, self.budgets['specifications'], "\n"),
+        }
+    
+    def fit_items(self, items: List[str], budget: int, separator: str) -> str:
+        """予算に収まる分だけ項目を先頭から採用"""
+        selected = []
+        used = 0
+        for item in items:
+            cost = self.estimate_tokens(item + separator)
+            if used + cost > budget:
+                if not selected:
+                    selected.append(self.truncate(item, budget))
+                break
+            selected.append(item)
+            used += cost
+        return separator.join(selected)
+    
+    def unique(self, items: List[str]) -> List[str]:
+        """正規化後に重複する項目を除去"""
+        result = []
+        seen = set()
+        for item in items or []:
+            key = self._normalize(item)
+            if key and key not in seen:
+                seen.add(key)
+                result.append(item.strip())
+        return result
+    
+    def _normalize(self, text: str) -> str:
+        """比較用の正規化（記号・空白除去、小文字化）"""
+        return self.NORMALIZE_RE.sub('', str(text)).lower()
+
+class AIBackendStats:
+    """AIバックエンドごとのレイテンシ・エラー率（直近の呼び出しで集計）"""
+    
+    def __init__(self, window: int = 200):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.secondary_wins = 0
+    
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+    
+    def record_error(self):
+        self.outcomes.append(False)
+    
+    def seed(self, latencies: List[float]):
+        """前回までの実行で記録したレイテンシを読み込み（古い順。起動直後からヘッジ閾値を使えるようにする）"""
+        recent = list(self.latencies)
+        self.latencies.clear()
+        self.latencies.extend(list(latencies) + recent)
+    
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            'calls': len(self.outcomes),
+            'error_rate': round(self.error_rate(), 3),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'secondary_wins': self.secondary_wins,
+        }
+
+class AIBackend(abc.ABC):
+    """AIバックエンド基底クラス"""
+    
+    name = "base"
+    
+    def __init__(self, api_key: str, model_name: str):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.stats = AIBackendStats()
+        # バックエンドごとの同時実行枠（成否・レイテンシはバックエンド単位で同時実行数制御に伝わる）
+        self.scheduler: Optional[PriorityScheduler] = None
+    
+    @abc.abstractmethod
+    async def generate(self, prompt: str) -> Tuple[str, Optional[int], Optional[int]]:
+        """テキスト生成 (本文, 入力トークン数, 出力トークン数)"""
+
+class GeminiBackend(AIBackend):
+    """Google Gemini バックエンド"""
+    
+    name = "gemini"
+    
+    def __init__(self, api_key: str, model_name: str = 'gemini-pro'):
+        super().__init__(api_key, model_name)
+    
+    async def generate(self, prompt: str) -> Tuple[str, Optional[int], Optional[int]]:
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        model = genai.GenerativeModel(self.model_name)
+        
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(prompt)
+        else:
+            # 同期APIしかない場合はイベントループを止めないようスレッドで実行
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, model.generate_content, prompt)
+        
+        usage = getattr(response, 'usage_metadata', None)
+        return (response.text,
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None))
+
+class ClaudeBackend(AIBackend):
+    """Anthropic Claude バックエンド（Messages API）"""
+    
+    name = "claude"
+    API_URL = "https://api.anthropic.com/v1/messages"
+    
+    def __init__(self, api_key: str, model_name: str = None, max_tokens: int = 2048):
+        super().__init__(api_key, model_name or os.getenv('CLAUDE_MODEL', 'claude-3-5-haiku-latest'))
+        self.max_tokens = max_tokens
+    
+    async def generate(self, prompt: str) -> Tuple[str, Optional[int], Optional[int]]:
+        import aiohttp
+        
+        headers = {
+            'x-api-key': self.api_key,
+            'anthropic-version': '2023-06-01',
+            'content-type': 'application/json'
+        }
+        payload = {
+            'model': self.model_name,
+            'max_tokens': self.max_tokens,
+            'messages': [{'role': 'user', 'content': prompt}]
+        }
+        
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.API_URL, headers=headers, json=payload) as response:
+                # 429/5xx をステータス付きの例外で返し、同時実行数制御に伝える
+                response.raise_for_status()
+                data = await response.json()
+        
+        text = "".join(block.get('text', '') for block in data.get('content', []) if block.get('type') == 'text')
+        usage = data.get('usage', {})
+        return text, usage.get('input_tokens'), usage.get('output_tokens')
+
 class AIContentGenerator:
     """AI商品説明文生成システム"""
     
-    def __init__(self, gemini_api_key: str = None, claude_api_key: str = None):
+    # 全バックエンドが失敗したときに返す本文の接頭辞
+    FAILURE_PREFIX = "自動生成に失敗しました"
+    
+    def __init__(self, gemini_api_key: str = None, claude_api_key: str = None,
+                 prompt_builder: PromptBuilder = None, backends: List[AIBackend] = None,
+                 hedge_percentile: float = 0.95, min_hedge_delay: float = 2.0,
+                 max_hedge_delay: float = 30.0, min_samples: int = 20):
         self.gemini_api_key = gemini_api_key or os.getenv('GEMINI_API_KEY')
         self.claude_api_key = claude_api_key or os.getenv('CLAUDE_API_KEY')
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        
+        # 設定済みのAPIキーからバックエンドを構成（先頭がプライマリ）
+        if backends is None:
+            backends = []
+            if self.gemini_api_key:
+                backends.append(GeminiBackend(self.gemini_api_key))
+            if self.claude_api_key:
+                backends.append(ClaudeBackend(self.claude_api_key))
+        self.backends = backends
+        
+        # プライマリが観測p95を超えても応答しなければ次のバックエンドへヘッジ
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.min_samples = min_samples
+        # 呼び出しごとのトークン数・レイテンシ記録先（RakutenGoldAutomationSystemが設定）
+        self.usage_recorder: Optional[Callable[..., None]] = None
     
     async def generate_rakuten_title(self, product: ProductInfo) -> str:
         """楽天用SEO最適化タイトル生成"""
+        fields = self.prompt_builder.compact(product)
+        features = self.prompt_builder.fit_items(
+            self.prompt_builder.unique(product.features)[:3], self.prompt_builder.budgets['title_features'], ", "
+        )
         prompt = f"""
         以下のAmazon商品情報から、楽天市場向けのSEO最適化されたタイトルを生成してください。
 
-        商品名: {product.title}
+        商品名: {fields['title']}
         カテゴリ: {product.category}
         価格: ¥{product.price:,.0f}
-        特徴: {', '.join(product.features[:3])}
+        特徴: {features}
 
         要件:
         - 50文字以内
@@ -137,17 +1163,19 @@ class AIContentGenerator:
         楽天用タイトル:
         """
         
-        return await self._call_ai_api(prompt, "title")
+        return await self._call_ai_api(prompt, "title", product.asin)
     
     async def generate_rakuten_description(self, product: ProductInfo) -> str:
         """楽天用商品説明文生成"""
+        fields = self.prompt_builder.compact(product)
         prompt = f"""
         以下のAmazon商品情報から、楽天市場向けの魅力的な商品説明文を生成してください。
 
-        商品名: {product.title}
-        説明: {product.description}
-        特徴: {', '.join(product.features)}
-        仕様: {json.dumps(product.specifications, ensure_ascii=False)}
+        商品名: {fields['title']}
+        説明: {fields['description']}
+        特徴: {fields['features']}
+        仕様:
+        {fields['specifications']}
 
         要件:
         - HTMLタグを使用した見やすいレイアウト
@@ -159,36 +1187,512 @@ class AIContentGenerator:
         楽天用商品説明文:
         """
         
-        return await self._call_ai_api(prompt, "description")
+        return await self._call_ai_api(prompt, "description", product.asin)
     
-    async def _call_ai_api(self, prompt: str, content_type: str) -> str:
-        """AI API呼び出し（Gemini使用）"""
+    async def _call_ai_api(self, prompt: str, content_type: str, asin: str = '') -> str:
+        """AI API呼び出し（複数バックエンドのヘッジ・フォールバック付き）"""
+        start = time.perf_counter()
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=self.gemini_api_key)
-            model = genai.GenerativeModel('gemini-pro')
-            
-            response = model.generate_content(prompt)
-            return response.text
+            backend, text, input_tokens, output_tokens, sent_at = await self._generate_hedged(prompt)
+            # レイテンシは採用したバックエンド自体の応答時間（次回起動時のヘッジ閾値の初期値になる）
+            self._record_usage(asin, content_type, prompt, text, sent_at, backend.model_name,
+                               input_tokens, output_tokens)
+            return text
             
         except Exception as e:
             logger.error(f"AI API call failed: {e}")
-            return f"自動生成に失敗しました: {content_type}"
+            self._record_usage(asin, content_type, prompt, "", start, "-", None, None, success=False)
+            return f"{self.FAILURE_PREFIX}: {content_type}"
+    
+    async def _generate_hedged(self, prompt: str) -> Tuple[AIBackend, str, Optional[int], Optional[int], float]:
+        """プライマリに送信し、閾値を超えたら次のバックエンドにも送信して最初の有効な応答を採用（送信時刻も返す）
+        
+        各バックエンドへの送信はそれぞれの枠で行うため、プライマリの429/5xxは後続が成功しても
+        プライマリの同時実行数制御に失敗として伝わる。
+        """
+        backends = self._ordered_backends()
+        if not backends:
+            raise RuntimeError("AIバックエンドが設定されていません (GEMINI_API_KEY / CLAUDE_API_KEY)")
+        
+        pending: Dict[asyncio.Task, tuple] = {}
+        next_index = 0
+        last_error: Optional[Exception] = None
+        
+        def launch():
+            nonlocal next_index
+            backend = backends[next_index]
+            next_index += 1
+            task = asyncio.ensure_future(self._generate_with(backend, prompt))
+            pending[task] = (backend, time.perf_counter(), next_index > 1)
+        
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if next_index < len(backends):
+                    # 直近に送信したバックエンドの観測レイテンシを基準にヘッジ
+                    newest_backend, newest_start, _ = list(pending.values())[-1]
+                    timeout = max(0.0, self._hedge_delay(newest_backend) - (time.perf_counter() - newest_start))
+                
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"AI応答が遅いためヘッジ送信: {backends[next_index].name}")
+                    launch()
+                    continue
+                
+                for task in done:
+                    backend, _, secondary = pending.pop(task)
+                    try:
+                        (text, input_tokens, output_tokens), sent_at = task.result()
+                        if not text or not text.strip():
+                            raise ValueError("空の応答")
+                    except Exception as e:
+                        backend.stats.record_error()
+                        last_error = e
+                        logger.warning(f"AIバックエンド失敗 ({backend.name}): {e}")
+                        continue
+                    
+                    backend.stats.record_success(time.perf_counter() - sent_at)
+                    if secondary:
+                        backend.stats.secondary_wins += 1
+                    return backend, text, input_tokens, output_tokens, sent_at
+                
+                # 全て失敗した場合は待たずに次のバックエンドへフォールバック
+                if not pending and next_index < len(backends):
+                    launch()
+        finally:
+            # 負けた側のリクエストはキャンセル
+            for task in pending:
+                task.cancel()
+        
+        raise last_error or RuntimeError("AI応答を取得できませんでした")
+    
+    async def _generate_with(self, backend: AIBackend, prompt: str) -> Tuple[tuple, float]:
+        """バックエンドの枠を確保して生成 (生成結果, 送信時刻)。枠待ちの時間はレイテンシに含めない"""
+        async with backend.scheduler.slot() if backend.scheduler else NO_SLOT:
+            sent_at = time.perf_counter()
+            return await backend.generate(prompt), sent_at
+    
+    def _ordered_backends(self) -> List[AIBackend]:
+        """エラー率の高いバックエンドを後ろに回す（設定順を基本とする）"""
+        return sorted(self.backends, key=lambda b: b.stats.error_rate() > 0.5)
+    
+    def _hedge_delay(self, backend: AIBackend) -> float:
+        """ヘッジ送信までの待ち時間（サンプル不足の間は上限値）"""
+        if len(backend.stats.latencies) < self.min_samples:
+            return self.max_hedge_delay
+        threshold = backend.stats.percentile(self.hedge_percentile)
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, threshold))
+    
+    def seed_backend_stats(self, latencies_by_model: Dict[str, List[float]]):
+        """モデル名ごとの過去のレイテンシ（秒、古い順）でバックエンドの統計を初期化"""
+        for backend in self.backends:
+            samples = latencies_by_model.get(backend.model_name)
+            if samples:
+                backend.stats.seed(samples)
+    
+    @classmethod
+    def is_failure(cls, text: str) -> bool:
+        """生成失敗時の代替本文かどうか"""
+        return text.startswith(cls.FAILURE_PREFIX)
+    
+    def backend_stats(self) -> Dict[str, Dict[str, Any]]:
+        """バックエンドごとのレイテンシ・エラー統計"""
+        return {backend.name: dict(backend.stats.to_dict(), hedge_delay_s=round(self._hedge_delay(backend), 2))
+                for backend in self.backends}
+    
+    def _record_usage(self, asin: str, content_type: str, prompt: str, output: str, start: float,
+                      model: str, input_tokens: Optional[int], output_tokens: Optional[int],
+                      success: bool = True):
+        """トークン数とレイテンシを記録（APIが使用量を返さない場合は概算）"""
+        if not self.usage_recorder:
+            return
+        
+        estimated = input_tokens is None or output_tokens is None
+        if input_tokens is None:
+            input_tokens = self.prompt_builder.estimate_tokens(prompt)
+        if output_tokens is None:
+            output_tokens = self.prompt_builder.estimate_tokens(output)
+        
+        try:
+            self.usage_recorder(
+                asin=asin, content_type=content_type, model=model,
+                input_tokens=input_tokens, output_tokens=output_tokens,
+                latency_ms=round((time.perf_counter() - start) * 1000, 1),
+                estimated=estimated, success=success
+            )
+        except Exception as e:
+            logger.warning(f"AI使用量の記録に失敗しました: {e}")
+
+class GoldPageBundle:
+    """GOLDページ一括アーカイブ（tar.gz / zip ストリーム書き込み）"""
+    
+    def __init__(self, bundle_path: Path, bundle_format: str = "tar"):
+        if bundle_format not in ("tar", "zip"):
+            raise ValueError(f"未対応のバンドル形式です: {bundle_format}")
+        
+        self.bundle_format = bundle_format
+        suffix = ".tar.gz" if bundle_format == "tar" else ".zip"
+        self.bundle_path = Path(str(bundle_path) + suffix) if not str(bundle_path).endswith(suffix) else Path(bundle_path)
+        self.bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._names = set()
+        
+        # tarはストリームモード(w|gz)で開き、ページ追加ごとに逐次書き出す
+        if bundle_format == "tar":
+            import tarfile
+            self._archive = tarfile.open(str(self.bundle_path), "w|gz")
+        else:
+            import zipfile
+            self._archive = zipfile.ZipFile(self.bundle_path, "w", compression=zipfile.ZIP_DEFLATED)
+    
+    def add(self, arcname: str, content: bytes):
+        """アーカイブにページを追加"""
+        with self._lock:
+            if arcname in self._names:
+                return
+            self._names.add(arcname)
+            
+            if self.bundle_format == "tar":
+                import tarfile
+                info = tarfile.TarInfo(name=arcname)
+                info.size = len(content)
+                info.mtime = int(datetime.now().timestamp())
+                self._archive.addfile(info, io.BytesIO(content))
+            else:
+                self._archive.writestr(arcname, content)
+            self._count += 1
+    
+    def __contains__(self, arcname: str) -> bool:
+        with self._lock:
+            return arcname in self._names
+    
+    def close(self) -> str:
+        """アーカイブを閉じてパスを返す"""
+        with self._lock:
+            self._archive.close()
+        logger.info(f"GOLDページバンドル作成完了: {self.bundle_path} ({self._count}件)")
+        return str(self.bundle_path)
+
+class GoldPageStore:
+    """楽天GOLDページ出力ストア（ハッシュシャーディング・アトミック書き込み）"""
+    
+    MANIFEST_NAME = "latest.json"
+    LATEST_LINK_NAME = "latest.html"
+    ASSETS_DIR = "assets"
+    
+    def __init__(self, root: Path = Path("output/rakuten_pages"), shard_depth: int = 2,
+                 keep_pages: Optional[int] = None):
+        self.root = Path(root)
+        self.shard_depth = shard_depth
+        # ASINごとに残す日付別ページ数（None は全て残す。過去分は ContentVersionStore で参照）
+        self.keep_pages = keep_pages
+    
+    def asin_dir(self, asin: str) -> Path:
+        """ASINごとの格納ディレクトリ（例: ab/cd/B07XJ8C8F5）"""
+        digest = hashlib.sha1(asin.upper().encode("utf-8")).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return self.root.joinpath(*shards, asin.upper())
+    
+    def page_path(self, asin: str, date_str: str = None) -> Path:
+        """ページファイルパス取得"""
+        date_str = date_str or datetime.now().strftime('%Y%m%d')
+        return self.asin_dir(asin) / f"product_{asin}_{date_str}.html"
+    
+    def write_page(self, asin: str, html_content: str, bundle: GoldPageBundle = None) -> str:
+        """ページをアトミックに書き込み、最新ポインタを更新（bundle指定時はアーカイブにも追加）"""
+        output_file = self.page_path(asin)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        content = html_content.encode('utf-8')
+        self._atomic_write(output_file, content)
+        self._update_latest(asin, output_file)
+        if self.keep_pages:
+            self._prune_pages(asin)
+        
+        if bundle:
+            bundle.add(output_file.relative_to(self.root).as_posix(), content)
+        
+        return str(output_file)
+    
+    def add_to_bundle(self, bundle: GoldPageBundle, page_path: str):
+        """書き込み済みページと参照している共有アセットをアーカイブに追加"""
+        page_file = Path(page_path)
+        arcname = page_file.relative_to(self.root).as_posix()
+        if arcname in bundle:
+            return
+        content = page_file.read_bytes()
+        bundle.add(arcname, content)
+        
+        for name in re.findall(rf'{self.ASSETS_DIR}/([\w.-]+)', content.decode('utf-8')):
+            asset_file = self.root / self.ASSETS_DIR / name
+            if asset_file.exists():
+                bundle.add(asset_file.relative_to(self.root).as_posix(), asset_file.read_bytes())
+    
+    def write_asset(self, name: str, content: bytes, bundle: GoldPageBundle = None) -> Path:
+        """共有アセット（CSS等）を書き込み（内容ハッシュ付きの名前なので既存なら再利用）"""
+        asset_file = self.root / self.ASSETS_DIR / name
+        if not asset_file.exists():
+            asset_file.parent.mkdir(parents=True, exist_ok=True)
+            self._atomic_write(asset_file, content)
+        
+        if bundle:
+            bundle.add(asset_file.relative_to(self.root).as_posix(), content)
+        
+        return asset_file
+    
+    def _atomic_write(self, target: Path, content: bytes):
+        """一時ファイルに書き込んでからリネーム"""
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstempは0600で作成するため、FTP配信用に通常の権限へ戻す
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    def _prune_pages(self, asin: str):
+        """古い日付別ページを削除（ファイル名の日付順で新しいものを keep_pages 件残す）"""
+        pages = sorted(self.asin_dir(asin).glob(f"product_{asin}_*.html"))
+        for old_page in pages[:-self.keep_pages]:
+            with contextlib.suppress(FileNotFoundError):
+                old_page.unlink()
+    
+    def _update_latest(self, asin: str, output_file: Path):
+        """最新ページのマニフェストとシンボリックリンクを更新"""
+        manifest = {
+            'asin': asin,
+            'latest': output_file.name,
+            'updated_at': datetime.now().isoformat()
+        }
+        self._atomic_write(
+            output_file.parent / self.MANIFEST_NAME,
+            json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+        )
+        
+        # シンボリックリンクは作成できない環境（Windows等）ではマニフェストのみ
+        link_path = output_file.parent / self.LATEST_LINK_NAME
+        tmp_link = output_file.parent / f".{self.LATEST_LINK_NAME}.tmp"
+        try:
+            if tmp_link.is_symlink() or tmp_link.exists():
+                tmp_link.unlink()
+            os.symlink(output_file.name, tmp_link)
+            os.replace(tmp_link, link_path)
+        except (OSError, NotImplementedError) as e:
+            logger.debug(f"latestシンボリックリンク作成スキップ: {e}")
+
+class GoldPageOptimizer:
+    """GOLDページ軽量化（共有CSS抽出・インラインスタイルのクラス化・HTML圧縮・画像遅延読み込み）"""
+    
+    STYLE_BLOCK_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+    PRESERVE_RE = re.compile(r'(<(script|pre|textarea)\b.*?</\2>)', re.S | re.I)
+    TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+    STYLE_ATTR_RE = re.compile(r'\sstyle="([^"]*)"', re.I)
+    CLASS_ATTR_RE = re.compile(r'\sclass="([^"]*)"', re.I)
+    COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.S)
+    BLOCK_TAGS = (
+        'html|head|body|meta|link|title|style|script|div|section|header|footer|main|nav|'
+        'h[1-6]|p|ul|ol|li|table|thead|tbody|tr|th|td|br|hr'
+    )
+    BLOCK_SPACE_RE = re.compile(r'\s*(</?(?:' + BLOCK_TAGS + r')\b[^>]*>)\s*', re.I)
+    
+    def __init__(self, store: GoldPageStore, min_repeat: int = 2,
+                 image_size: tuple = (500, 500), minify: bool = True):
+        self.store = store
+        self.min_repeat = min_repeat
+        self.image_size = image_size
+        self.minify = minify
+    
+    def optimize(self, asin: str, html_content: str, bundle: GoldPageBundle = None) -> str:
+        """ページHTMLを軽量化（共有CSSはbundle指定時にアーカイブにも追加）"""
+        original_size = len(html_content.encode('utf-8'))
+        
+        html_content, class_css = self._rewrite_tags(html_content)
+        html_content = self._extract_stylesheet(asin, html_content, bundle)
+        if class_css:
+            # クラス化したスタイルはAI生成の説明文にも由来しページごとに異なるため、共有CSSに入れずページ内に置く
+            html_content = self._insert_head(html_content, f'<style>{class_css}</style>')
+        if self.minify:
+            html_content = self._minify_html(html_content)
+        
+        logger.debug(f"{asin} - ページ軽量化: {original_size:,} → {len(html_content.encode('utf-8')):,} bytes")
+        return html_content
+    
+    def _extract_stylesheet(self, asin: str, html_content: str, bundle: GoldPageBundle = None) -> str:
+        """テンプレートの<style>ブロックをバージョン付き共有CSSファイルに切り出し"""
+        blocks = self.STYLE_BLOCK_RE.findall(html_content)
+        if not blocks:
+            return html_content
+        
+        css = self._minify_css("\n".join(blocks))
+        if self.image_size:
+            # width/height属性は縦横比のヒントとしてのみ使う（:whereで詳細度0にしてテンプレートCSSを優先）
+            css = ":where(img[width][height]){max-width:100%;height:auto}" + css
+        version = hashlib.sha1(css.encode('utf-8')).hexdigest()[:10]
+        asset_file = self.store.write_asset(f"gold_{version}.css", css.encode('utf-8'), bundle)
+        href = Path(os.path.relpath(asset_file, self.store.asin_dir(asin))).as_posix()
+        
+        # <style>を削除してlinkを追加
+        html_content = self.STYLE_BLOCK_RE.sub(lambda m: "", html_content)
+        return self._insert_head(html_content, f'<link rel="stylesheet" href="{href}">')
+    
+    @staticmethod
+    def _insert_head(html_content: str, tag: str) -> str:
+        """</head>の直前（headが無ければ先頭）にタグを追加"""
+        if '</head>' in html_content:
+            return html_content.replace('</head>', f'{tag}\n</head>', 1)
+        return tag + html_content
+    
+    def _rewrite_tags(self, html_content: str) -> Tuple[str, str]:
+        """繰り返しインラインスタイルをクラス化し、画像に遅延読み込み属性を付与 (HTML, クラスのCSS)"""
+        segments = self.PRESERVE_RE.split(html_content)
+        # split結果は [通常, 保護ブロック, タグ名, 通常, ...] の並び
+        plain_indexes = range(0, len(segments), 3)
+        
+        counts: Dict[str, int] = {}
+        for i in plain_indexes:
+            for match in self.STYLE_ATTR_RE.finditer(segments[i]):
+                decl = self._normalize_declaration(match.group(1))
+                counts[decl] = counts.get(decl, 0) + 1
+        
+        classes = {
+            decl: f"gs-{hashlib.md5(decl.encode('utf-8')).hexdigest()[:6]}"
+            for decl, count in counts.items() if decl and count >= self.min_repeat
+        }
+        image_index = [0]
+        
+        def replace_tag(match):
+            tag, attrs, closing = match.group(1), match.group(2) or "", match.group(3)
+            
+            style_match = self.STYLE_ATTR_RE.search(attrs)
+            if style_match:
+                class_name = classes.get(self._normalize_declaration(style_match.group(1)))
+                if class_name:
+                    attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+                    class_match = self.CLASS_ATTR_RE.search(attrs)
+                    if class_match:
+                        attrs = (attrs[:class_match.start()] +
+                                 f' class="{class_match.group(1)} {class_name}"' +
+                                 attrs[class_match.end():])
+                    else:
+                        attrs += f' class="{class_name}"'
+            
+            if tag.lower() == 'img':
+                attrs = self._image_attrs(attrs, image_index[0])
+                image_index[0] += 1
+            
+            return f"<{tag}{attrs}{closing}>"
+        
+        for i in plain_indexes:
+            segments[i] = self.TAG_RE.sub(replace_tag, segments[i])
+        
+        html_content = "".join(segments[i] for i in range(len(segments)) if i % 3 != 2)
+        
+        # クラス名は宣言のハッシュなので、ページ間で同じスタイルには同じクラス名が付く
+        class_css = "".join(f".{name}{{{decl}}}" for decl, name in sorted(classes.items(), key=lambda x: x[1]))
+        return html_content, class_css
+    
+    def _image_attrs(self, attrs: str, index: int) -> str:
+        """画像属性付与（先頭画像はLCP対象なので優先読み込み）"""
+        lowered = attrs.lower()
+        if index == 0:
+            if 'fetchpriority=' not in lowered:
+                attrs += ' fetchpriority="high"'
+        elif 'loading=' not in lowered:
+            attrs += ' loading="lazy"'
+        
+        if 'decoding=' not in lowered:
+            attrs += ' decoding="async"'
+        if self.image_size and 'width=' not in lowered and 'height=' not in lowered:
+            attrs += f' width="{self.image_size[0]}" height="{self.image_size[1]}"'
+        return attrs
+    
+    def _normalize_declaration(self, decl: str) -> str:
+        """スタイル宣言を正規化"""
+        parts = [p.strip() for p in decl.split(';') if p.strip()]
+        return ";".join(re.sub(r'\s*:\s*', ':', p, count=1) for p in parts)
+    
+    def _minify_css(self, css: str) -> str:
+        """CSS圧縮"""
+        css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+        css = re.sub(r'\s+', ' ', css)
+        # ":" の前後はセレクタの子孫結合子 (".a :hover") と区別するため宣言内でのみ詰める
+        css = re.sub(r'([{;])\s*([-\w]+)\s*:\s*(?=[^{};]*[;}])', r'\1\2:', css)
+        css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+        return css.replace(';}', '}').strip()
+    
+    def _minify_html(self, html_content: str) -> str:
+        """HTML圧縮（script/pre/textarea内は行頭インデントのみ除去）"""
+        segments = self.PRESERVE_RE.split(html_content)
+        output = []
+        for i, segment in enumerate(segments):
+            if i % 3 == 0:
+                segment = self.COMMENT_RE.sub('', segment)
+                segment = re.sub(r'\s+', ' ', segment)
+                segment = self.BLOCK_SPACE_RE.sub(r'\1', segment)
+                output.append(segment)
+            elif i % 3 == 1:
+                if segment[:4].lower() == '<pre' or segment[:9].lower() == '<textarea':
+                    output.append(segment)
+                else:
+                    output.append("\n".join(line.strip() for line in segment.splitlines() if line.strip()))
+        return "".join(output).strip()
 
 class RakutenGoldPageGenerator:
     """楽天GOLD商品ページ生成システム"""
     
-    def __init__(self):
+    PLACEHOLDER_RE = re.compile(r'\{\{|\}\}|\{(\w+)\}')
+    
+    def __init__(self, optimize: bool = True):
         self.template_path = Path("templates/rakuten_gold_template.html")
         self.output_path = Path("output/rakuten_pages")
-        self.output_path.mkdir(parents=True, exist_ok=True)
+        self.store = GoldPageStore(self.output_path)
+        self.optimizer = GoldPageOptimizer(self.store) if optimize else None
+        # ページ本文の履歴保存先 (asin, {'page': 本文})。RakutenGoldAutomationSystemがDB書き込みスレッド経由の保存を設定
+        self.content_recorder: Optional[Callable[[str, Dict[str, str]], Any]] = None
     
-    def generate_gold_page(self, product: ProductInfo, rakuten_data: RakutenProductData) -> str:
+    def generate_gold_page(self, product: ProductInfo, rakuten_data: RakutenProductData,
+                           bundle: GoldPageBundle = None) -> str:
         """楽天GOLDページ生成"""
+        html_content = self.render_gold_page(product, rakuten_data)
+        output_file = self._finalize_page(product.asin, html_content, bundle)
+        
+        logger.info(f"楽天GOLDページ生成完了: {output_file}")
+        return output_file
+    
+    async def generate_gold_page_async(self, product: ProductInfo, rakuten_data: RakutenProductData,
+                                       bundle: GoldPageBundle = None) -> str:
+        """楽天GOLDページ生成（軽量化・ファイル書き込みはイベントループ外で実行）"""
+        html_content = self.render_gold_page(product, rakuten_data)
+        loop = asyncio.get_running_loop()
+        output_file = await loop.run_in_executor(None, self._finalize_page, product.asin, html_content, bundle)
+        
+        logger.info(f"楽天GOLDページ生成完了: {output_file}")
+        return output_file
+    
+    def _finalize_page(self, asin: str, html_content: str, bundle: GoldPageBundle = None) -> str:
+        """軽量化ステージを通してページを保存"""
+        if self.content_recorder:
+            # 履歴は軽量化前の描画結果を保存（1行に圧縮したページでは差分が読めない）
+            self.content_recorder(asin, {'page': html_content})
+        if self.optimizer:
+            html_content = self.optimizer.optimize(asin, html_content, bundle)
+        return self.store.write_page(asin, html_content, bundle)
+    
+    def render_gold_page(self, product: ProductInfo, rakuten_data: RakutenProductData) -> str:
+        """楽天GOLDページHTMLレンダリング"""
         template = self._load_template()
         
         # テンプレート変数置換
-        html_content = template.format(
+        html_content = self._render_template(
+            template,
             item_name=rakuten_data.item_name,
             item_price=f"¥{rakuten_data.item_price:,}",
             item_caption=rakuten_data.item_caption,
@@ -204,15 +1708,20 @@ class RakutenGoldPageGenerator:
             item_price_numeric=rakuten_data.item_price
         )
         
-        # ファイル保存
-        filename = f"product_{product.asin}_{datetime.now().strftime('%Y%m%d')}.html"
-        output_file = self.output_path / filename
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        return html_content
+    
+    def _render_template(self, template: str, **values) -> str:
+        """テンプレート変数置換（CSS/JSONの波括弧はそのまま残す）"""
+        def replace(match):
+            token = match.group(0)
+            if token == '{{':
+                return '{'
+            if token == '}}':
+                return '}'
+            key = match.group(1)
+            return str(values[key]) if key in values else token
         
-        logger.info(f"楽天GOLDページ生成完了: {output_file}")
-        return str(output_file)
+        return self.PLACEHOLDER_RE.sub(replace, template)
     
     def _load_template(self) -> str:
         """HTMLテンプレート読み込み"""
@@ -243,6 +1752,10 @@ class RakutenGoldPageGenerator:
         .specs-table {{ width: 100%; border-collapse: collapse; margin: 30px 0; }}
         .specs-table th, .specs-table td {{ border: 1px solid #ddd; padding: 10px; }}
         .buy-button {{ background: #e60012; color: white; padding: 15px 30px; font-size: 18px; }}
+        .gallery-image {{ width: 100%; margin-bottom: 10px; }}
+        .related-grid {{ display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px; }}
+        .related-item {{ text-align: center; border: 1px solid #ddd; padding: 10px; }}
+        .related-item img {{ width: 100%; }}
     </style>
 </head>
 <body>
@@ -298,7 +1811,7 @@ class RakutenGoldPageGenerator:
         
         gallery_html = ""
         for img_url in images[:4]:  # 最大4枚
-            gallery_html += f'<img src="{img_url}" style="width: 100%; margin-bottom: 10px;">\n'
+            gallery_html += f'<img src="{img_url}" class="gallery-image">\n'
         
         return gallery_html
     
@@ -329,21 +1842,21 @@ class RakutenGoldPageGenerator:
     def _generate_related_products(self) -> str:
         """関連商品セクション生成"""
         return """
-        <div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px;">
-            <div style="text-align: center; border: 1px solid #ddd; padding: 10px;">
-                <img src="placeholder.jpg" style="width: 100%;">
+        <div class="related-grid">
+            <div class="related-item">
+                <img src="placeholder.jpg">
                 <p>関連商品1</p>
             </div>
-            <div style="text-align: center; border: 1px solid #ddd; padding: 10px;">
-                <img src="placeholder.jpg" style="width: 100%;">
+            <div class="related-item">
+                <img src="placeholder.jpg">
                 <p>関連商品2</p>
             </div>
-            <div style="text-align: center; border: 1px solid #ddd; padding: 10px;">
-                <img src="placeholder.jpg" style="width: 100%;">
+            <div class="related-item">
+                <img src="placeholder.jpg">
                 <p>関連商品3</p>
             </div>
-            <div style="text-align: center; border: 1px solid #ddd; padding: 10px;">
-                <img src="placeholder.jpg" style="width: 100%;">
+            <div class="related-item">
+                <img src="placeholder.jpg">
                 <p>関連商品4</p>
             </div>
         </div>
@@ -356,9 +1869,12 @@ class RakutenAPIConnector:
         self.service_secret = service_secret or os.getenv('RAKUTEN_SERVICE_SECRET')
         self.license_key = license_key or os.getenv('RAKUTEN_LICENSE_KEY')
         self.base_url = "https://api.rms.rakuten.co.jp/es/1.0"
+        self.scheduler: Optional[PriorityScheduler] = None
     
     async def upload_product(self, rakuten_data: RakutenProductData) -> bool:
         """楽天に商品をアップロード"""
+        import aiohttp
+        
         try:
             headers = {
                 'Content-Type': 'application/json',
@@ -381,17 +1897,546 @@ class RakutenAPIConnector:
             
             async with aiohttp.ClientSession() as session:
                 url = f"{self.base_url}/item/insert"
-                async with session.post(url, headers=headers, json=product_data) as response:
-                    if response.status == 200:
-                        logger.info(f"商品アップロード成功: {rakuten_data.item_name}")
-                        return True
-                    else:
-                        logger.error(f"商品アップロード失敗: {response.status}")
-                        return False
+                async with self.scheduler.slot() if self.scheduler else NO_SLOT as outcome:
+                    async with session.post(url, headers=headers, json=product_data) as response:
+                        outcome.status = response.status
+                        if response.status == 200:
+                            logger.info(f"商品アップロード成功: {rakuten_data.item_name}")
+                            return True
+                        else:
+                            logger.error(f"商品アップロード失敗: {response.status}")
+                            return False
                         
         except Exception as e:
             logger.error(f"Error uploading product: {e}")
             return False
+    
+    async def update_item_price(self, item_url: str, item_price: int, session=None) -> bool:
+        """出品済み商品の販売価格を更新（session: 一括反映時に共有するセッション）"""
+        import aiohttp
+        
+        try:
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'ESA {self.service_secret}:{self.license_key}'
+            }
+            payload = {'item': {'itemUrl': item_url, 'itemPrice': item_price}}
+            url = f"{self.base_url}/item/update"
+            
+            # セッションは枠を確保してから開く（枠待ちの間に接続資源を抱えない）
+            async with self.scheduler.slot() if self.scheduler else NO_SLOT as outcome:
+                async with contextlib.AsyncExitStack() as stack:
+                    if session is None:
+                        session = await stack.enter_async_context(aiohttp.ClientSession())
+                    async with session.post(url, headers=headers, json=payload) as response:
+                        outcome.status = response.status
+                        if response.status == 200:
+                            return True
+                        logger.error(f"価格更新失敗: {item_url} ({response.status})")
+                        return False
+        
+        except Exception as e:
+            logger.error(f"Error updating item price: {e}")
+            return False
+
+class RunProfiler:
+    """実行プロファイラ（cProfile・スタックサンプリング・tracemallocスナップショット）"""
+    
+    def __init__(self, output_dir: Path, sample_interval: float = 0.005,
+                 max_snapshots: int = 50, top_n: int = 40):
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.max_snapshots = max_snapshots
+        self.top_n = top_n
+        self._profile = None
+        self._stacks: Dict[str, int] = {}
+        self._memory_marks: List[tuple] = []
+        self._snapshot_count = 0
+        self._target_thread_id: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+    
+    def start(self):
+        """計測開始"""
+        import cProfile
+        import tracemalloc
+        
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / "tracemalloc").mkdir(exist_ok=True)
+        
+        tracemalloc.start(25)
+        self._target_thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+        
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self.mark("-", "run", "start")
+    
+    def mark(self, asin: str, stage: str, status: str):
+        """ステージ境界でのメモリ計測（スナップショットはmax_snapshots件まで）"""
+        import tracemalloc
+        
+        if not tracemalloc.is_tracing():
+            return
+        
+        current, peak = tracemalloc.get_traced_memory()
+        self._memory_marks.append((datetime.now().isoformat(timespec='milliseconds'),
+                                   asin, stage, status, current, peak))
+        
+        if self._snapshot_count < self.max_snapshots:
+            self._snapshot_count += 1
+            snapshot = tracemalloc.take_snapshot()
+            safe_stage = re.sub(r'\W+', '_', f"{asin}_{stage}_{status}")
+            snapshot.dump(str(self.output_dir / "tracemalloc" / f"{self._snapshot_count:04d}_{safe_stage}.snap"))
+    
+    def stop(self) -> Path:
+        """計測終了して結果を出力"""
+        import pstats
+        import tracemalloc
+        
+        self.mark("-", "run", "end")
+        self._profile.disable()
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.join()
+        
+        # CPUプロファイル（pstatsバイナリとテキストサマリ）
+        self._profile.dump_stats(str(self.output_dir / "profile.pstats"))
+        with open(self.output_dir / "profile.txt", 'w', encoding='utf-8') as f:
+            stats = pstats.Stats(self._profile, stream=f)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(self.top_n)
+            stats.sort_stats('tottime').print_stats(self.top_n)
+        
+        # flamegraph.pl / speedscope で読み込める collapsed stack 形式
+        with open(self.output_dir / "flamegraph.collapsed", 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+        
+        # ステージ境界ごとのメモリ推移と最終スナップショットの上位
+        with open(self.output_dir / "memory.csv", 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'asin', 'stage', 'status', 'current_bytes', 'peak_bytes'])
+            writer.writerows(self._memory_marks)
+        
+        snapshot = tracemalloc.take_snapshot()
+        with open(self.output_dir / "memory_top.txt", 'w', encoding='utf-8') as f:
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                f.write(f"{stat}\n")
+        tracemalloc.stop()
+        
+        logger.info(f"プロファイル出力完了: {self.output_dir}")
+        return self.output_dir
+    
+    def _sample_loop(self):
+        """対象スレッドのコールスタックを定期的に採取"""
+        while not self._stop_event.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self._stacks[key] = self._stacks.get(key, 0) + 1
+
+class SingleFlight:
+    """同一キーの同時実行を1回にまとめる（後続の呼び出しは実行中の結果を共有）"""
+    
+    def __init__(self):
+        self._calls: Dict[Any, Tuple[asyncio.Future, Any]] = {}
+        self.coalesced = 0
+    
+    async def do(self, key: Any, factory: Callable[[], Any], context: Any = None,
+                 on_join: Callable[[Any], Any] = None) -> Any:
+        """keyの処理が実行中ならその完了を待ち、なければfactory()を実行
+        
+        context: 実行を開始した場合に紐づける値（合流時に on_join(実行中の処理のcontext) が呼ばれる）
+        """
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = (task, context)
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            task, running_context = entry
+            self.coalesced += 1
+            logger.debug(f"実行中の処理に合流: {key}")
+            if on_join:
+                on_join(running_context)
+        
+        # 1つの呼び出し元がキャンセルされても共有中の処理は継続させる
+        return await asyncio.shield(task)
+    
+    def in_flight(self) -> int:
+        """実行中の処理数"""
+        return len(self._calls)
+    
+    def _forget(self, key: Any, task: asyncio.Future):
+        entry = self._calls.get(key)
+        if entry and entry[0] is task:
+            del self._calls[key]
+
+def new_run_id() -> str:
+    """実行IDを発行（秒単位の時刻にPIDと乱数を付け、同時に起動したプロセス間でも重複しない）"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+
+class RunHistoryStore:
+    """実行履歴ストア（実行日パーティションのParquet、未対応環境ではCSV）"""
+    
+    COLUMNS = [
+        'run_id', 'run_date', 'processed_at', 'asin', 'status', 'error_class', 'message',
+        'category', 'amazon_price', 'rakuten_price',
+        'fetch_ms', 'ai_ms', 'page_ms', 'upload_ms', 'total_ms'
+    ]
+    STAGE_COLUMNS = {
+        'fetch_amazon_data': 'fetch_ms',
+        'ai_generation': 'ai_ms',
+        'generate_gold_page': 'page_ms',
+        'upload_rakuten': 'upload_ms',
+        'total': 'total_ms',
+    }
+    
+    def __init__(self, root: Path = Path("output/results/history")):
+        self.root = Path(root)
+    
+    def to_rows(self, run_id: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """処理結果を履歴の行に変換"""
+        now = datetime.now()
+        rows = []
+        for result in results:
+            row = {column: None for column in self.COLUMNS}
+            row.update({
+                'run_id': run_id,
+                'run_date': now.strftime('%Y-%m-%d'),
+                'processed_at': now.isoformat(timespec='seconds'),
+                'asin': result['asin'],
+                'status': 'success' if result['success'] else 'failed',
+                'error_class': result.get('error_class') or '',
+                'message': result.get('message', ''),
+                'category': result.get('category') or '',
+                'amazon_price': result.get('amazon_price'),
+                'rakuten_price': result.get('rakuten_price'),
+            })
+            for stage, column in self.STAGE_COLUMNS.items():
+                row[column] = result.get('timings', {}).get(stage)
+            rows.append(row)
+        return rows
+    
+    def append(self, run_id: str, results: List[Dict[str, Any]]) -> Path:
+        """1回の実行分を run_date=YYYY-MM-DD/ パーティションに書き込み"""
+        rows = self.to_rows(run_id, results)
+        partition = self.root / f"run_date={rows[0]['run_date']}"
+        partition.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            import pandas as pd
+        except ImportError:
+            pd = None
+        
+        if pd is not None:
+            df = pd.DataFrame(rows, columns=self.COLUMNS)
+            try:
+                path = partition / f"run_{run_id}.parquet"
+                df.to_parquet(path, index=False)
+                return path
+            except ImportError:
+                # pyarrow / fastparquet が無い環境はCSVにフォールバック
+                pass
+            path = partition / f"run_{run_id}.csv"
+            df.to_csv(path, index=False, encoding='utf-8')
+            return path
+        
+        path = partition / f"run_{run_id}.csv"
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+    
+    def load(self, since: str = None):
+        """履歴をDataFrameとして読み込み（since: YYYY-MM-DD 以降のパーティションのみ）"""
+        import pandas as pd
+        
+        frames = []
+        for partition in sorted(self.root.glob("run_date=*")):
+            if since and partition.name.split('=', 1)[1] < since:
+                continue
+            for path in sorted(partition.iterdir()):
+                if path.suffix == '.parquet':
+                    frames.append(pd.read_parquet(path))
+                elif path.suffix == '.csv':
+                    frames.append(pd.read_csv(path, dtype={'run_id': str, 'asin': str}, keep_default_na=False,
+                                              na_values=['']))
+        
+        if not frames:
+            return pd.DataFrame(columns=self.COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+    
+    def report(self, since: str = None) -> Dict[str, Any]:
+        """実行履歴の集計（pandasのベクトル演算で集計）"""
+        df = self.load(since)
+        if df.empty:
+            return {'rows': 0}
+        
+        df['success'] = df['status'] == 'success'
+        timing_columns = list(self.STAGE_COLUMNS.values())
+        df[timing_columns] = df[timing_columns].apply(lambda column: column.astype(float))
+        
+        by_run = df.groupby('run_id').agg(
+            asins=('asin', 'size'), success_rate=('success', 'mean'), total_ms_mean=('total_ms', 'mean')
+        ).sort_index()
+        by_category = df[df['category'].fillna('') != ''].groupby('category').agg(
+            asins=('asin', 'nunique'), success_rate=('success', 'mean'),
+            avg_amazon_price=('amazon_price', 'mean'), avg_rakuten_price=('rakuten_price', 'mean')
+        ).sort_values('asins', ascending=False)
+        errors = df.loc[~df['success'], 'error_class'].fillna('').replace('', 'unknown').value_counts()
+        timings = df[timing_columns].describe(percentiles=[0.5, 0.95]).T[['count', 'mean', '50%', '95%', 'max']]
+        
+        return {
+            'rows': len(df),
+            'runs': df['run_id'].nunique(),
+            'unique_asins': df['asin'].nunique(),
+            'success_rate': float(df['success'].mean()),
+            'by_run': by_run,
+            'by_category': by_category,
+            'errors': errors,
+            'timings': timings,
+        }
+
+class ProductSnapshotStore:
+    """商品データスナップショット保存（プレビュー等でAPIを呼ばずに再レンダリングするため）"""
+    
+    def __init__(self, db_path: str = "rakuten_automation.db"):
+        self.db_path = db_path
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS product_snapshots (
+                asin TEXT PRIMARY KEY,
+                product_json TEXT,
+                rakuten_json TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        conn.close()
+    
+    def save(self, product: ProductInfo, rakuten_data: RakutenProductData):
+        """スナップショット保存（ASINごとに最新のみ保持）"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT OR REPLACE INTO product_snapshots (asin, product_json, rakuten_json, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, (
+            product.asin,
+            json.dumps(asdict(product), ensure_ascii=False),
+            json.dumps(asdict(rakuten_data), ensure_ascii=False)
+        ))
+        conn.commit()
+        conn.close()
+    
+    def load(self, asin: str) -> Optional[tuple]:
+        """スナップショット読み込み (ProductInfo, RakutenProductData)"""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT product_json, rakuten_json FROM product_snapshots WHERE asin = ?", (asin,)
+        ).fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        return ProductInfo(**json.loads(row[0])), RakutenProductData(**json.loads(row[1]))
+    
+    def list_asins(self) -> List[str]:
+        """保存済みASIN一覧（更新日時の新しい順）"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT asin FROM product_snapshots ORDER BY updated_at DESC").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+class ContentVersionStore:
+    """生成コンテンツのバージョン管理ストア（内容ハッシュで重複排除・zlib圧縮・ASIN別バージョンポインタ）"""
+    
+    # 前バージョンを圧縮辞書にして差分だけを保存（読み出しコストを抑えるためチェーン長に上限）
+    MAX_CHAIN = 8
+    ZDICT_LIMIT = 32 * 1024  # zlibの辞書として有効なのは末尾32KBまで
+    
+    def __init__(self, db_path: str = "rakuten_automation.db", compress_level: int = 9):
+        self.db_path = db_path
+        self.compress_level = compress_level
+        # 直近に読み書きした本文（次回の差分圧縮の辞書になる）。ページ保存はスレッドプールから呼ばれる
+        self._cache: Dict[str, str] = {}
+        self._cache_lock = threading.Lock()
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS content_blobs (
+                hash TEXT PRIMARY KEY,
+                base_hash TEXT,
+                depth INTEGER,
+                raw_size INTEGER,
+                stored_size INTEGER,
+                data BLOB
+            );
+            CREATE TABLE IF NOT EXISTS content_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                asin TEXT,
+                kind TEXT,
+                hash TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_content_versions_asin ON content_versions (asin, kind, id);
+        """)
+        conn.commit()
+        conn.close()
+    
+    def save(self, asin: str, contents: Dict[str, str]) -> Dict[str, bool]:
+        """kind → 本文 を保存（直前のバージョンと同じ内容ならポインタも追加しない）"""
+        saved = {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                for kind, text in contents.items():
+                    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                    latest = conn.execute(
+                        "SELECT hash FROM content_versions WHERE asin = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+                        (asin, kind)
+                    ).fetchone()
+                    if latest and latest[0] == digest:
+                        saved[kind] = False
+                        continue
+                    
+                    if not conn.execute("SELECT 1 FROM content_blobs WHERE hash = ?", (digest,)).fetchone():
+                        self._put_blob(conn, digest, text, latest[0] if latest else None)
+                    conn.execute(
+                        "INSERT INTO content_versions (asin, kind, hash) VALUES (?, ?, ?)", (asin, kind, digest)
+                    )
+                    saved[kind] = True
+        finally:
+            conn.close()
+        return saved
+    
+    def get(self, asin: str, kind: str, version: int = -1) -> Optional[str]:
+        """本文の取得（version: 0始まりの番号、負数は新しい方から）"""
+        history = self.history(asin, kind)
+        try:
+            entry = history[version]
+        except IndexError:
+            return None
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return self._read_blob(conn, entry['hash'])
+        finally:
+            conn.close()
+    
+    def history(self, asin: str, kind: str = None) -> List[Dict[str, Any]]:
+        """バージョン履歴（本文は展開しないのでASIN数・バージョン数が増えても軽い）"""
+        query = """
+            SELECT v.id, v.kind, v.hash, v.created_at, b.raw_size, b.stored_size
+            FROM content_versions v JOIN content_blobs b ON b.hash = v.hash
+            WHERE v.asin = ?
+        """
+        params: List[Any] = [asin]
+        if kind:
+            query += " AND v.kind = ?"
+            params.append(kind)
+        query += " ORDER BY v.id"
+        
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        
+        columns = ('id', 'kind', 'hash', 'created_at', 'raw_size', 'stored_size')
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def diff(self, asin: str, kind: str, old_version: int = -2, new_version: int = -1) -> str:
+        """2つのバージョン間の差分（unified diff）を読み出し時に生成"""
+        import difflib
+        
+        old = self.get(asin, kind, old_version) or ''
+        new = self.get(asin, kind, new_version) or ''
+        return '\n'.join(difflib.unified_diff(
+            self._diff_lines(old), self._diff_lines(new),
+            fromfile=f"{asin}/{kind}@{old_version}", tofile=f"{asin}/{kind}@{new_version}", lineterm=''
+        ))
+    
+    @staticmethod
+    def _diff_lines(text: str) -> List[str]:
+        """差分用の行分割（1行に詰まったHTMLもタグ境界で区切る）"""
+        return re.sub(r'>[ \t]*<', '>\n<', text).splitlines()
+    
+    def stats(self) -> Dict[str, Any]:
+        """保存量の集計"""
+        conn = sqlite3.connect(self.db_path)
+        blobs, raw_bytes, stored_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM content_blobs"
+        ).fetchone()
+        versions, asins = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT asin) FROM content_versions"
+        ).fetchone()
+        conn.close()
+        
+        return {
+            'asins': asins,
+            'versions': versions,
+            'blobs': blobs,
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+        }
+    
+    def _put_blob(self, conn: sqlite3.Connection, digest: str, text: str, base_hash: Optional[str]):
+        """本文を圧縮して保存（前バージョンがあればそれを辞書にした差分圧縮）"""
+        raw = text.encode('utf-8')
+        depth = 0
+        zdict = None
+        if base_hash:
+            base_depth = conn.execute("SELECT depth FROM content_blobs WHERE hash = ?", (base_hash,)).fetchone()
+            if base_depth and base_depth[0] < self.MAX_CHAIN:
+                zdict = self._read_blob(conn, base_hash).encode('utf-8')[-self.ZDICT_LIMIT:]
+                depth = base_depth[0] + 1
+        
+        if zdict:
+            compressor = zlib.compressobj(self.compress_level, zdict=zdict)
+        else:
+            compressor = zlib.compressobj(self.compress_level)
+            base_hash = None
+        data = compressor.compress(raw) + compressor.flush()
+        
+        conn.execute(
+            "INSERT INTO content_blobs (hash, base_hash, depth, raw_size, stored_size, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, base_hash, depth, len(raw), len(data), data)
+        )
+        self._remember(digest, text)
+    
+    def _read_blob(self, conn: sqlite3.Connection, digest: str) -> str:
+        """本文の展開（差分圧縮は辞書にした前バージョンから順に展開）"""
+        with self._cache_lock:
+            cached = self._cache.get(digest)
+        if cached is not None:
+            return cached
+        
+        base_hash, data = conn.execute(
+            "SELECT base_hash, data FROM content_blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if base_hash:
+            zdict = self._read_blob(conn, base_hash).encode('utf-8')[-self.ZDICT_LIMIT:]
+            decompressor = zlib.decompressobj(zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj()
+        text = (decompressor.decompress(data) + decompressor.flush()).decode('utf-8')
+        self._remember(digest, text)
+        return text
+    
+    def _remember(self, digest: str, text: str, max_entries: int = 256):
+        with self._cache_lock:
+            if len(self._cache) >= max_entries:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[digest] = text
 
 class RakutenGoldAutomationSystem:
     """楽天GOLD自動化システム メインクラス"""
@@ -399,11 +2444,48 @@ class RakutenGoldAutomationSystem:
     def __init__(self):
         self.amazon_collector = AmazonDataCollector()
         self.category_mapper = RakutenCategoryMapper()
+        self.pricing = PricingRuleEngine()
         self.ai_generator = AIContentGenerator()
         self.page_generator = RakutenGoldPageGenerator()
         self.rakuten_api = RakutenAPIConnector()
         self.db_path = "rakuten_automation.db"
         self._init_database()
+        self.snapshots = ProductSnapshotStore(self.db_path)
+        # 生成コピー・ページ本文の履歴はDBに重複排除して保存し、日付別HTMLは直近分のみ残す
+        self.contents = ContentVersionStore(self.db_path)
+        self.page_generator.content_recorder = self._record_contents
+        self.page_generator.store.keep_pages = int(os.getenv('GOLD_PAGE_KEEP_FILES', '3'))
+        self._inflight = SingleFlight()
+        self.run_history = RunHistoryStore()
+        
+        # 上流APIごとの優先度スケジューラ（単一ASINの対話的処理を一括処理より先に通す）
+        # AIはバックエンド（プロバイダー）ごとに枠を分ける（'ai:gemini' / 'ai:claude'）
+        self.schedulers = {
+            'amazon': PriorityScheduler('amazon', capacity=4),
+            'rakuten': PriorityScheduler('rakuten', capacity=2),
+        }
+        for backend in self.ai_generator.backends:
+            backend.scheduler = self.schedulers[f'ai:{backend.name}'] = PriorityScheduler(f'ai:{backend.name}', capacity=2)
+        self.amazon_collector.scheduler = self.schedulers['amazon']
+        self.rakuten_api.scheduler = self.schedulers['rakuten']
+        # 同時実行数は初期値から観測したレイテンシ・エラーに応じて自動調整（上限はプロバイダーの制限に合わせる）
+        max_limits = {'amazon': 16, 'rakuten': 8}
+        self.concurrency = {
+            name: AdaptiveConcurrencyController(scheduler, max_limit=max_limits.get(name, 8))
+            for name, scheduler in self.schedulers.items()
+        }
+        # --profile 指定時に RunProfiler を設定（ステージ境界でメモリを計測）
+        self.profiler: Optional[RunProfiler] = None
+        self.ai_generator.usage_recorder = self._record_ai_usage
+        # ヘッジ閾値はプロセスごとの統計なので、過去の実行のレイテンシで初期化（短いCLI実行でも上限まで待たない）
+        self.ai_generator.seed_backend_stats(self._load_ai_latencies())
+        # 処理中のDB書き込みは専用スレッドで順番に実行（イベントループを止めない・SQLiteのロック競合を避ける）
+        self._db_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        
+        # ログマネージャ起動中はDBへのログ書き込みもリスナースレッドに任せる
+        self.log_manager = PipelineLogManager.active()
+        if self.log_manager:
+            self.log_manager.attach_database(self.db_path)
     
     def _init_database(self):
         """データベース初期化"""
@@ -432,40 +2514,107 @@ class RakutenGoldAutomationSystem:
             )
         """)
         
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ai_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                asin TEXT,
+                content_type TEXT,
+                model TEXT,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                latency_ms REAL,
+                estimated INTEGER,
+                success INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        ensure_price_columns(conn)
         conn.commit()
         conn.close()
     
-    async def process_asin(self, asin: str) -> Dict[str, Any]:
-        """ASINを処理して楽天商品を生成"""
-        result = {
+    async def process_asin(self, asin: str, product_data: ProductInfo = None,
+                           priority: str = 'interactive', bundle: GoldPageBundle = None) -> Dict[str, Any]:
+        """ASINを処理して楽天商品を生成（同じASINの同時リクエストは1回の処理を共有）
+        
+        priority: 'interactive'（単一処理）/ 'bulk'（一括処理）/ 'background'（再同期）
+            より高い優先度で実行中の処理に合流した場合、その処理の優先度を引き上げる
+        bundle: 生成ページを追加するこの実行のアーカイブ
+        """
+        asin = asin.strip().upper()
+        execution = ExecutionPriority(priority)
+        result = await self._inflight.do(
+            ('process', asin), lambda: self._process_asin(asin, product_data, execution),
+            context=execution, on_join=lambda running: running.promote(priority)
+        )
+        if bundle and result['success'] and result['gold_page_path']:
+            # アップロードに成功した商品のページだけをアーカイブに入れる（合流した呼び出し元も同じ経路）
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, self.page_generator.store.add_to_bundle, bundle, result['gold_page_path']
+            )
+        # 呼び出し元ごとに結果を書き換えても影響しないようコピーを返す
+        return dict(result, timings=dict(result['timings']))
+    
+    def _new_result(self, asin: str) -> Dict[str, Any]:
+        """処理結果の初期値"""
+        return {
             'asin': asin,
             'success': False,
             'message': '',
             'rakuten_url': '',
-            'gold_page_path': ''
+            'gold_page_path': '',
+            'error_class': '',
+            'category': '',
+            'amazon_price': None,
+            'rakuten_price': None,
+            'timings': {}
         }
+    
+    def _end_stage(self, result: Dict[str, Any], stage: str, status: str, message: str, stage_start: float):
+        """ステージ終了の記録（所要時間を結果に保存してログ出力）"""
+        elapsed = self._elapsed_ms(stage_start)
+        result['timings'][stage] = elapsed
+        self._log_action(result['asin'], stage, status, message, duration_ms=elapsed)
+    
+    async def _process_asin(self, asin: str, product_data: ProductInfo = None,
+                            execution: ExecutionPriority = None) -> Dict[str, Any]:
+        """ASIN処理本体（product_data指定時は一括取得済みのデータを使用）"""
+        # このタスク内の上流API呼び出しはすべてこの優先度でスケジュールされる
+        current_priority.set(execution or ExecutionPriority())
+        result = self._new_result(asin)
+        process_start = time.perf_counter()
         
         try:
             # 1. Amazon商品データ取得
             self._log_action(asin, "fetch_amazon_data", "start", "Amazon商品データ取得開始")
-            product_data = await self.amazon_collector.fetch_product_data(asin)
+            stage_start = time.perf_counter()
+            if product_data is None:
+                product_data = await self.amazon_collector.fetch_product_data(asin)
             
             if not product_data:
                 result['message'] = "Amazon商品データの取得に失敗しました"
+                result['error_class'] = 'fetch_failed'
+                self._end_stage(result, "fetch_amazon_data", "failed", result['message'], stage_start)
                 return result
+            self._end_stage(result, "fetch_amazon_data", "success", "Amazon商品データ取得完了", stage_start)
+            result['category'] = product_data.category
+            result['amazon_price'] = product_data.price
             
             # 2. 楽天カテゴリマッピング
             rakuten_category = self.category_mapper.get_rakuten_category(product_data.category)
             
             # 3. AI生成（タイトル・説明文）
             self._log_action(asin, "ai_generation", "start", "AI コンテンツ生成開始")
+            stage_start = time.perf_counter()
             rakuten_title = await self.ai_generator.generate_rakuten_title(product_data)
             rakuten_description = await self.ai_generator.generate_rakuten_description(product_data)
+            self._end_stage(result, "ai_generation", "success", "AI コンテンツ生成完了", stage_start)
             
             # 4. 楽天商品データ作成
             rakuten_data = RakutenProductData(
                 item_name=rakuten_title,
-                item_price=int(product_data.price * 1.2),  # 20%マージン
+                item_price=self.pricing.price(product_data.price, product_data.category),
                 item_caption=rakuten_description,
                 category_id=rakuten_category,
                 item_url=f"product-{asin.lower()}",
@@ -475,17 +2624,34 @@ class RakutenGoldAutomationSystem:
                 tax_flag=1        # 税込み
             )
             
+            result['rakuten_price'] = rakuten_data.item_price
+            
+            # テンプレートプレビュー用にスナップショット保存
+            await self._db_write(self.snapshots.save, product_data, rakuten_data)
+            # 生成に失敗した代替本文は履歴に残さない（直前の正常なバージョンを最新のまま保つ）
+            contents = {kind: text for kind, text in (('title', rakuten_title), ('description', rakuten_description))
+                        if not self.ai_generator.is_failure(text)}
+            if contents:
+                await self._db_write(self.contents.save, asin, contents)
+            
             # 5. 楽天GOLDページ生成
             self._log_action(asin, "generate_gold_page", "start", "楽天GOLDページ生成開始")
-            gold_page_path = self.page_generator.generate_gold_page(product_data, rakuten_data)
+            stage_start = time.perf_counter()
+            gold_page_path = await self.page_generator.generate_gold_page_async(product_data, rakuten_data)
+            self._end_stage(result, "generate_gold_page", "success", "楽天GOLDページ生成完了", stage_start)
             
             # 6. 楽天RMS API経由でアップロード
             self._log_action(asin, "upload_rakuten", "start", "楽天商品アップロード開始")
+            stage_start = time.perf_counter()
+            # 同じASIN（= itemUrl）の処理は process_asin で1回にまとめられているので同時insertは起きない
             upload_success = await self.rakuten_api.upload_product(rakuten_data)
             
             if upload_success:
+                result['timings']['upload_rakuten'] = self._elapsed_ms(stage_start)
+                
                 # 7. データベース更新
-                self._update_product_status(asin, rakuten_data.item_url, "completed")
+                await self._db_write(self._update_product_status, asin, rakuten_data.item_url, "completed",
+                                     rakuten_data.item_price)
                 
                 result.update({
                     'success': True,
@@ -494,62 +2660,260 @@ class RakutenGoldAutomationSystem:
                     'gold_page_path': gold_page_path
                 })
                 
-                self._log_action(asin, "process_complete", "success", "処理完了")
+                self._log_action(asin, "process_complete", "success", "処理完了",
+                                 duration_ms=self._elapsed_ms(process_start))
             else:
                 result['message'] = "楽天への商品アップロードに失敗しました"
-                self._log_action(asin, "upload_rakuten", "failed", "アップロード失敗")
+                result['error_class'] = 'upload_failed'
+                self._end_stage(result, "upload_rakuten", "failed", "アップロード失敗", stage_start)
         
         except Exception as e:
             result['message'] = f"処理中にエラーが発生しました: {str(e)}"
-            self._log_action(asin, "process_error", "error", str(e))
+            result['error_class'] = type(e).__name__
+            self._log_action(asin, "process_error", "error", str(e),
+                             duration_ms=self._elapsed_ms(process_start))
         
+        result['timings']['total'] = self._elapsed_ms(process_start)
         return result
     
-    async def bulk_process_asins(self, asin_list: List[str]) -> List[Dict[str, Any]]:
-        """複数ASINの一括処理"""
-        results = []
+    async def bulk_process_asins(self, asin_list: List[str], bundle_format: str = None,
+                                 run_id: str = None, priority: str = 'bulk') -> List[Dict[str, Any]]:
+        """複数ASINの一括処理（bundle_format指定時は生成ページを1アーカイブにまとめる）"""
+        priority_token = current_priority.set(ExecutionPriority(priority))
+        run_id = run_id or new_run_id()
+        bundle = self.open_bundle(run_id, bundle_format) if bundle_format else None
+        
+        # CSV内で重複するASINは1回だけ処理し、結果を各行に割り当てる
+        unique_asins = list(dict.fromkeys(asin.strip().upper() for asin in asin_list))
+        if len(unique_asins) < len(asin_list):
+            logger.info(f"重複ASINを除外: {len(asin_list)}件 → {len(unique_asins)}件")
+        
+        processed: Dict[str, Dict[str, Any]] = {}
+        running: set = set()
+        
+        async def run(asin: str, product: Optional[ProductInfo]):
+            # バッチ自体が失敗したASIN（product=None）はprocess_asin内で個別取得にフォールバック
+            processed[asin] = await self.process_asin(asin, product_data=product, priority=priority, bundle=bundle)
         
-        for asin in asin_list:
-            logger.info(f"Processing ASIN: {asin}")
-            result = await self.process_asin(asin)
-            results.append(result)
+        try:
+            # Amazonデータはバッチエンドポイントから届いた順に処理（全件取得を待たない）
+            async for asin, product, miss_reason in self.amazon_collector.iter_products(unique_asins):
+                logger.info(f"Processing ASIN: {asin}")
+                if miss_reason and not miss_reason.startswith('batch_'):
+                    # 商品が存在しない等のASIN単位の失敗は個別に再取得しない
+                    result = self._new_result(asin)
+                    result['message'] = f"Amazon商品データの取得に失敗しました: {miss_reason}"
+                    result['error_class'] = miss_reason
+                    self._log_action(asin, "fetch_amazon_data", "failed", result['message'])
+                    processed[asin] = result
+                    continue
+                
+                # API呼び出しの流量は各スケジューラの枠（同時実行数制御）に任せ、同時に処理するASIN数は
+                # 枠を埋められるだけに抑える（枠が広がれば同時処理数も増える）
+                while len(running) >= self._bulk_concurrency():
+                    _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                running.add(asyncio.ensure_future(run(asin, product)))
             
-            # API制限回避のため1秒待機
-            await asyncio.sleep(1)
+            if running:
+                await asyncio.gather(*running)
+        finally:
+            for task in running:
+                task.cancel()
+            results = [
+                dict(processed[asin.strip().upper()]) for asin in asin_list
+                if asin.strip().upper() in processed
+            ]
+            if bundle:
+                bundle_path = bundle.close()
+                for result in results:
+                    result['bundle_path'] = bundle_path
+            self.record_run(run_id, [processed[asin] for asin in unique_asins if asin in processed])
+            current_priority.reset(priority_token)
         
         return results
     
-    def _update_product_status(self, asin: str, rakuten_url: str, status: str):
-        """商品ステータス更新"""
+    def _bulk_concurrency(self) -> int:
+        """一括処理で同時に進めるASIN数（現在の全スケジューラの枠の合計。待機が生じて同時実行数制御が働く）"""
+        return max(1, sum(scheduler.capacity for scheduler in self.schedulers.values()))
+    
+    def open_bundle(self, run_id: str, bundle_format: str = "tar") -> GoldPageBundle:
+        """この実行の生成ページをまとめるアーカイブを作成（process_asin / bulk_process_asins に渡す）"""
+        return GoldPageBundle(Path("output/bundles") / f"gold_pages_{run_id}", bundle_format)
+    
+    def record_run(self, run_id: str, results: List[Dict[str, Any]]):
+        """実行結果を実行履歴ストアに追記"""
+        if not results:
+            return
+        try:
+            path = self.run_history.append(run_id, results)
+            logger.info(f"実行履歴を保存: {path}")
+        except Exception as e:
+            logger.error(f"実行履歴の保存に失敗しました: {e}")
+    
+    def _update_product_status(self, asin: str, rakuten_url: str, status: str, rakuten_price: int = None):
+        """商品ステータス更新（アップロードした販売価格は楽天に反映済み）"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
             INSERT OR REPLACE INTO processed_products 
-            (asin, rakuten_item_url, status, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        """, (asin, rakuten_url, status))
+            (asin, rakuten_item_url, status, rakuten_price, price_pending, updated_at)
+            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP)
+        """, (asin, rakuten_url, status, rakuten_price))
         
         conn.commit()
         conn.close()
     
-    def _log_action(self, asin: str, action: str, status: str, message: str):
-        """アクションログ記録"""
+    async def sync_prices(self, priority: str = 'background') -> Dict[str, int]:
+        """再価格計算で変更した販売価格を楽天RMSに反映（反映できた商品のみ反映待ちを解除）"""
+        import aiohttp
+        
+        rows = await self._db_write(self._pending_prices)
+        synced: List[Tuple[str, int]] = []
+        failed: List[Tuple[str, int]] = []
+        running: set = set()
+        priority_token = current_priority.set(ExecutionPriority(priority))
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def push(asin: str, item_url: str, price: int):
+                    ok = await self.rakuten_api.update_item_price(item_url, price, session=session)
+                    (synced if ok else failed).append((asin, price))
+                
+                for row in rows:
+                    # 同時に送る件数は楽天の枠に合わせる（全件分のタスクを一度に作らない。枠が広がれば増える）
+                    while len(running) >= self.schedulers['rakuten'].capacity:
+                        _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    running.add(asyncio.ensure_future(push(*row)))
+                if running:
+                    await asyncio.gather(*running)
+        finally:
+            for task in running:
+                task.cancel()
+            current_priority.reset(priority_token)
+        
+        await self._db_write(self._mark_prices_synced, synced)
+        for asin, price in failed:
+            self._log_action(asin, "sync_price", "failed", f"価格の反映に失敗しました: ¥{price:,}")
+        return {'pending': len(rows), 'synced': len(synced), 'failed': len(failed)}
+    
+    def _pending_prices(self) -> List[Tuple[str, str, int]]:
+        """楽天への反映待ちの (asin, itemUrl, 販売価格)"""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        try:
+            return conn.execute("""
+                SELECT asin, rakuten_item_url, rakuten_price FROM processed_products
+                WHERE price_pending = 1 AND rakuten_price IS NOT NULL
+            """).fetchall()
+        finally:
+            conn.close()
+    
+    def _mark_prices_synced(self, synced: List[Tuple[str, int]]):
+        """反映済みの価格の反映待ちを解除（反映中に再計算された価格はそのまま残す）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("""
+                    UPDATE processed_products SET price_pending = 0
+                    WHERE asin = ? AND rakuten_price = ?
+                """, synced)
+        finally:
+            conn.close()
+    
+    def _log_action(self, asin: str, action: str, status: str, message: str,
+                    duration_ms: float = None):
+        """アクションログ記録"""
+        extra = {'asin': asin, 'stage': action, 'status': status, 'duration_ms': duration_ms}
         
-        cursor.execute("""
+        if self.log_manager:
+            # 監査ログはロガーのレベルで落とされないよう直接リスナーのキューへ
+            self.log_manager.audit(asin, action, status, message)
+        else:
+            # ログマネージャ未使用時（ライブラリとして直接利用）はDB書き込みスレッドで記録
+            self._submit_db_write(self._write_log, asin, action, status, message)
+        
+        logger.info(f"{asin} - {action}: {status} - {message}", extra=extra)
+        
+        if self.profiler:
+            self.profiler.mark(asin, action, status)
+    
+    def _write_log(self, asin: str, action: str, status: str, message: str):
+        """automation_logへの書き込み（DB書き込みスレッドで実行）"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
             INSERT INTO automation_log (asin, action, status, message)
             VALUES (?, ?, ?, ?)
         """, (asin, action, status, message))
-        
         conn.commit()
         conn.close()
+    
+    def _load_ai_latencies(self, window: int = 200) -> Dict[str, List[float]]:
+        """ai_usageに記録した成功時のレイテンシをモデルごとに直近window件読み込み（秒、古い順）"""
+        latencies: Dict[str, List[float]] = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                for backend in self.ai_generator.backends:
+                    rows = conn.execute("""
+                        SELECT latency_ms FROM ai_usage
+                        WHERE model = ? AND success = 1 AND latency_ms IS NOT NULL
+                        ORDER BY id DESC LIMIT ?
+                    """, (backend.model_name, window)).fetchall()
+                    latencies[backend.model_name] = [row[0] / 1000 for row in reversed(rows)]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"AIレイテンシ履歴の読み込みに失敗しました: {e}")
+        return latencies
+    
+    def _record_contents(self, asin: str, contents: Dict[str, str]):
+        """ページ本文の履歴保存（ページ生成スレッドから呼ばれるので書き込みは書き込みスレッドに任せる）"""
+        self._submit_db_write(self.contents.save, asin, contents)
+    
+    def _record_ai_usage(self, **usage):
+        """AI呼び出しのトークン数・レイテンシ記録（イベントループ上から呼ばれるので書き込みは別スレッド）"""
+        self._submit_db_write(self._write_ai_usage, **usage)
+    
+    def _write_ai_usage(self, asin: str, content_type: str, model: str, input_tokens: int,
+                        output_tokens: int, latency_ms: float, estimated: bool, success: bool):
+        """ai_usageへの書き込み（DB書き込みスレッドで実行）"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
         
-        logger.info(f"{asin} - {action}: {status} - {message}")
+        cursor.execute("""
+            INSERT INTO ai_usage
+            (asin, content_type, model, input_tokens, output_tokens, latency_ms, estimated, success)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (asin, content_type, model, input_tokens, output_tokens, latency_ms, int(estimated), int(success)))
+        
+        conn.commit()
+        conn.close()
+    
+    def _submit_db_write(self, func: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """DB書き込みを書き込みスレッドに投入（結果を待たない記録用。失敗はログに残す）"""
+        future = self._db_writer.submit(func, *args, **kwargs)
+        future.add_done_callback(self._report_db_write_error)
+        return future
+    
+    async def _db_write(self, func: Callable, *args, **kwargs):
+        """DB書き込みを書き込みスレッドで実行して完了を待つ"""
+        return await asyncio.wrap_future(self._db_writer.submit(func, *args, **kwargs))
+    
+    def flush_db_writes(self):
+        """投入済みのDB書き込みの完了を待つ"""
+        self._db_writer.submit(lambda: None).result()
+    
+    @staticmethod
+    def _report_db_write_error(future: concurrent.futures.Future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"DB書き込みに失敗しました: {future.exception()}")
+    
+    def _elapsed_ms(self, start: float) -> float:
+        """経過時間(ms)"""
+        return round((time.perf_counter() - start) * 1000, 1)
     
     def get_processing_status(self) -> Dict[str, Any]:
         """処理状況取得"""
+        self.flush_db_writes()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -561,6 +2925,10 @@ class RakutenGoldAutomationSystem:
         cursor.execute("SELECT COUNT(*) FROM processed_products WHERE status = 'failed'")
         failed_count = cursor.fetchone()[0]
         
+        # 楽天への反映待ちの価格変更
+        cursor.execute("SELECT COUNT(*) FROM processed_products WHERE price_pending = 1")
+        price_pending_count = cursor.fetchone()[0]
+        
         # 最近のログ
         cursor.execute("""
             SELECT asin, action, status, message, timestamp 
@@ -570,14 +2938,303 @@ class RakutenGoldAutomationSystem:
         """)
         recent_logs = cursor.fetchall()
         
+        # AI使用量
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(input_tokens), 0), COALESCE(SUM(output_tokens), 0),
+                   COALESCE(AVG(latency_ms), 0)
+            FROM ai_usage
+        """)
+        ai_calls, input_tokens, output_tokens, avg_latency = cursor.fetchone()
+        
         conn.close()
         
         return {
             'completed_products': completed_count,
             'failed_products': failed_count,
             'recent_logs': recent_logs,
-            'total_processed': completed_count + failed_count
+            'total_processed': completed_count + failed_count,
+            'price_pending': price_pending_count,
+            'ai_usage': {
+                'calls': ai_calls,
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'avg_latency_ms': round(avg_latency, 1)
+            },
+            'schedulers': {name: scheduler.stats() for name, scheduler in self.schedulers.items()},
+            'coalescing': {'in_flight': self._inflight.in_flight(), 'coalesced': self._inflight.coalesced},
+            'concurrency_limits': {name: controller.stats()['limit'] for name, controller in self.concurrency.items()},
+            'ai_backends': self.ai_generator.backend_stats()
+        }
+
+class PreviewAssetStore(GoldPageStore):
+    """プレビュー用ストア（共有CSS等のアセットをディスクに書かずメモリに保持）"""
+    
+    def __init__(self):
+        super().__init__(Path("preview"))
+        self.assets: Dict[str, bytes] = {}
+    
+    def write_asset(self, name: str, content: bytes, bundle: GoldPageBundle = None) -> Path:
+        self.assets[name] = content
+        return self.root / self.ASSETS_DIR / name
+    
+    def write_page(self, asin: str, html_content: str, bundle: GoldPageBundle = None) -> str:
+        raise RuntimeError("プレビューではページを保存しません")
+
+class TemplatePreviewServer:
+    """テンプレートプレビューサーバー（保存済みスナップショットから描画・テンプレート変更で自動再描画）"""
+    
+    RELOAD_SCRIPT = """<script>
+(function() {{
+    var version = {version};
+    setInterval(function() {{
+        fetch('/__version').then(function(r) {{ return r.text(); }}).then(function(v) {{
+            if (parseInt(v, 10) !== version) {{ location.reload(); }}
+        }}).catch(function() {{}});
+    }}, 500);
+}})();
+</script>"""
+    
+    def __init__(self, db_path: str = "rakuten_automation.db", template_path: str = None,
+                 host: str = "127.0.0.1", port: int = 8000, poll_interval: float = 0.3):
+        self.snapshots = ProductSnapshotStore(db_path)
+        # 本番と同じ軽量化（CSS切り出し・クラス化・画像属性付与）をメモリ上で適用する
+        self.page_generator = RakutenGoldPageGenerator(optimize=False)
+        self.assets = PreviewAssetStore()
+        self.optimizer = GoldPageOptimizer(self.assets)
+        if template_path:
+            self.page_generator.template_path = Path(template_path)
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._pages: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._template_mtime = self._current_mtime()
+        self._stop_event = threading.Event()
+    
+    def render(self, asin: str) -> str:
+        """ページ描画（キャッシュ済みならそのまま返す）"""
+        with self._lock:
+            if asin in self._pages:
+                return self._pages[asin]
+        
+        html_content = self._render_snapshot(asin)
+        if html_content is None:
+            # スナップショットが後から保存されたときに表示できるようキャッシュしない
+            return f"<p>スナップショットがありません: {html.escape(asin)}</p>"
+        
+        with self._lock:
+            self._pages[asin] = html_content
+        return html_content
+    
+    def _render_snapshot(self, asin: str) -> Optional[str]:
+        """スナップショットからHTMLを生成（有料APIは呼ばない。スナップショットが無ければNone）"""
+        snapshot = self.snapshots.load(asin)
+        if not snapshot:
+            return None
+        
+        try:
+            html_content = self.page_generator.render_gold_page(*snapshot)
+            return self.optimizer.optimize(asin, html_content)
+        except Exception as e:
+            logger.error(f"プレビュー描画エラー: {asin} - {e}")
+            return f"<h1>テンプレートエラー</h1><pre>{html.escape(f'{type(e).__name__}: {e}')}</pre>"
+    
+    def check_template(self) -> bool:
+        """テンプレート変更を検出し、表示済みのページだけ再描画"""
+        mtime = self._current_mtime()
+        if mtime == self._template_mtime:
+            return False
+        self._template_mtime = mtime
+        
+        start = time.perf_counter()
+        with self._lock:
+            asins = list(self._pages)
+        pages = {asin: self._render_snapshot(asin) for asin in asins}
+        with self._lock:
+            self._pages = {asin: page for asin, page in pages.items() if page is not None}
+            self.version += 1
+        
+        logger.info(f"テンプレート変更を検出: {len(pages)}ページ再描画 ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return True
+    
+    def _current_mtime(self) -> float:
+        """テンプレートの更新時刻（存在しない場合はデフォルトテンプレート扱い）"""
+        try:
+            return self.page_generator.template_path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+    
+    def _watch_template(self):
+        """テンプレート監視ループ（ポーリング）"""
+        while not self._stop_event.wait(self.poll_interval):
+            self.check_template()
+    
+    def _index_html(self) -> str:
+        """スナップショット一覧ページ"""
+        asins = self.snapshots.list_asins()
+        if not asins:
+            return "<p>スナップショットがありません。python main.py cli で一度商品を処理してください。</p>"
+        items = "".join(f'<li><a href="/{html.escape(asin)}">{html.escape(asin)}</a></li>' for asin in asins)
+        return f"<h1>GOLDページプレビュー</h1><ul>{items}</ul>"
+    
+    def _with_reload(self, html_content: str) -> str:
+        """自動リロードスクリプトを挿入"""
+        script = self.RELOAD_SCRIPT.format(version=self.version)
+        if '</body>' in html_content:
+            return html_content.replace('</body>', script + '</body>', 1)
+        return html_content + script
+    
+    def serve_forever(self):
+        """プレビューサーバー起動"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        server_ref = self
+        
+        class PreviewHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0].strip('/')
+                asset_prefix = f"{GoldPageStore.ASSETS_DIR}/"
+                if path.startswith(asset_prefix) and path[len(asset_prefix):] in server_ref.assets.assets:
+                    # ページから相対参照される共有CSS
+                    data = server_ref.assets.assets[path[len(asset_prefix):]]
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/css; charset=utf-8')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.send_header('Cache-Control', 'no-store')
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                
+                if '.' in path or '/' in path:
+                    # favicon等のASIN以外のリクエスト
+                    self.send_error(404)
+                    return
+                
+                if path == '__version':
+                    body = str(server_ref.version)
+                    content_type = 'text/plain; charset=utf-8'
+                elif path == '':
+                    body = server_ref._with_reload(server_ref._index_html())
+                    content_type = 'text/html; charset=utf-8'
+                else:
+                    body = server_ref._with_reload(server_ref.render(path))
+                    content_type = 'text/html; charset=utf-8'
+                
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                logger.debug(f"preview - {format % args}")
+        
+        watcher = threading.Thread(target=self._watch_template, daemon=True)
+        watcher.start()
+        
+        httpd = ThreadingHTTPServer((self.host, self.port), PreviewHandler)
+        logger.info(f"プレビューサーバー起動: http://{self.host}:{self.port}/ (テンプレート: {self.page_generator.template_path})")
+        try:
+            httpd.serve_forever()
+        finally:
+            self._stop_event.set()
+            httpd.server_close()
+
+class ProductDataStandInServer:
+    """商品データAPIのローカル代替サーバー（開発・検証用。実APIを呼ばずにバッチ取得を確認する）"""
+    
+    def __init__(self, fixtures_path: str = None, host: str = "127.0.0.1", port: int = 8100,
+                 max_batch_size: int = 100):
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        # 受け付けたバッチリクエストのASIN数（チャンク分割の確認用）
+        self.batch_sizes: List[int] = []
+        self.fixtures: Dict[str, Dict] = {}
+        self.synthesize = fixtures_path is None
+        
+        if fixtures_path:
+            with open(fixtures_path, 'r', encoding='utf-8') as f:
+                for item in json.load(f):
+                    self.fixtures[item['asin'].upper()] = item
+    
+    def lookup(self, asin: str) -> Optional[Dict]:
+        """ASINの商品データ（フィクスチャ未指定時はダミーデータを生成）"""
+        asin = asin.upper()
+        if asin in self.fixtures:
+            return self.fixtures[asin]
+        if not self.synthesize or not re.fullmatch(r'[A-Z0-9]{10}', asin):
+            return None
+        return {
+            'asin': asin,
+            'title': f"テスト商品 {asin}",
+            'price': {'value': 1000 + int(hashlib.md5(asin.encode()).hexdigest()[:4], 16) % 9000},
+            'description': f"{asin} のテスト用商品説明です。",
+            'images': [f"https://example.com/images/{asin}_{i}.jpg" for i in range(3)],
+            'category': 'Electronics',
+            'features': ["特徴A", "特徴B", "特徴C"],
+            'specifications': {'メーカー': 'テスト', '型番': asin}
         }
+    
+    def create_server(self):
+        """HTTPサーバーを作成（port=0 で空きポートを割り当て。テストではスレッドで起動する）"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        server_ref = self
+        
+        class StandInHandler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes, content_type: str = 'application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_GET(self):
+                match = re.fullmatch(r'/v1/products/([A-Za-z0-9]+)', self.path)
+                product = server_ref.lookup(match.group(1)) if match else None
+                if product:
+                    self._send(200, json.dumps(product, ensure_ascii=False).encode('utf-8'))
+                else:
+                    self._send(404, b'{"error": "not_found"}')
+            
+            def do_POST(self):
+                if self.path != '/v1/products/batch':
+                    self._send(404, b'{"error": "not_found"}')
+                    return
+                
+                length = int(self.headers.get('Content-Length', 0))
+                asins = json.loads(self.rfile.read(length) or b'{}').get('asins', [])
+                server_ref.batch_sizes.append(len(asins))
+                if len(asins) > server_ref.max_batch_size:
+                    self._send(413, b'{"error": "too_many_asins"}')
+                    return
+                
+                lines = []
+                for asin in asins:
+                    product = server_ref.lookup(asin)
+                    lines.append(product if product else {'asin': asin, 'error': 'not_found'})
+                body = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+                self._send(200, body.encode('utf-8'), 'application/x-ndjson')
+            
+            def log_message(self, format, *args):
+                logger.debug(f"standin - {format % args}")
+        
+        httpd = ThreadingHTTPServer((self.host, self.port), StandInHandler)
+        self.port = httpd.server_address[1]
+        return httpd
+    
+    def serve_forever(self):
+        """代替サーバー起動"""
+        httpd = self.create_server()
+        logger.info(f"商品データAPI代替サーバー起動: http://{self.host}:{self.port}/v1")
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
 
 # 使用例とメイン実行部分
 async def main():
@@ -619,6 +3276,8 @@ async def main():
     print(f"総処理数: {status['total_processed']}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # 環境変数設定の確認
     required_env_vars = [
         'PRODUCT_DATA_API_KEY',
@@ -0,0 +1,10 @@
+# tests/conftest.py - テスト共通設定
+import sys
+from pathlib import Path
+
+# リポジトリ直下のモジュール（rakuten_gold_automation.py）を読み込めるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: 子プロセスを起動する時間のかかるテスト")
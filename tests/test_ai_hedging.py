@@ -0,0 +1,107 @@
+# tests/test_ai_hedging.py - AIバックエンドのヘッジ・フォールバックのテスト
+import asyncio
+import sqlite3
+
+import pytest
+
+from rakuten_gold_automation import AIBackend, AIContentGenerator, RakutenGoldAutomationSystem
+
+
+class FakeBackend(AIBackend):
+    """指定時間後に応答（または例外）を返すバックエンド"""
+
+    def __init__(self, name, delay=0.0, error=None, text=None):
+        super().__init__("test-key", f"{name}-model")
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.text = text if text is not None else f"{name}の応答"
+        self.calls = 0
+        self.cancelled = False
+
+    async def generate(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.text, 10, 5
+
+
+def make_generator(*backends, **kwargs):
+    kwargs.setdefault('min_hedge_delay', 0.01)
+    kwargs.setdefault('max_hedge_delay', 0.05)
+    return AIContentGenerator(backends=list(backends), **kwargs)
+
+
+def test_backend_base_class_requires_generate():
+    with pytest.raises(TypeError):
+        AIBackend("test-key", "model")
+
+
+def test_slow_primary_is_hedged_to_secondary():
+    primary, secondary = FakeBackend("primary", delay=1.0), FakeBackend("secondary")
+    generator = make_generator(primary, secondary)
+
+    text = asyncio.run(generator._call_ai_api("prompt", "title"))
+
+    assert text == "secondaryの応答"
+    assert primary.cancelled
+    assert secondary.stats.secondary_wins == 1
+    assert primary.stats.to_dict()['calls'] == 0
+
+
+def test_failed_primary_falls_back_without_waiting_for_hedge_delay():
+    primary = FakeBackend("primary", error=RuntimeError("503"))
+    secondary = FakeBackend("secondary")
+    generator = make_generator(primary, secondary, max_hedge_delay=10.0)
+
+    async def run():
+        return await asyncio.wait_for(generator._call_ai_api("prompt", "title"), timeout=1.0)
+
+    assert asyncio.run(run()) == "secondaryの応答"
+    assert primary.stats.error_rate() == 1.0
+
+
+def test_all_backends_failing_returns_placeholder():
+    generator = make_generator(FakeBackend("primary", text=" "), FakeBackend("secondary", error=ValueError()))
+
+    assert asyncio.run(generator._call_ai_api("prompt", "title")) == "自動生成に失敗しました: title"
+
+
+def test_hedge_delay_uses_observed_latency_after_min_samples():
+    backend = FakeBackend("primary")
+    generator = make_generator(backend, min_hedge_delay=0.5, max_hedge_delay=30.0, min_samples=5)
+
+    assert generator._hedge_delay(backend) == 30.0
+    backend.stats.seed([1.0, 1.2, 1.1, 0.9, 1.5])
+    assert generator._hedge_delay(backend) == 1.5
+
+
+def test_hedge_stats_are_seeded_from_recorded_usage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setenv("CLAUDE_API_KEY", "test-key")
+    monkeypatch.setenv("CLAUDE_MODEL", "claude-test")
+
+    first = RakutenGoldAutomationSystem()
+    conn = sqlite3.connect(first.db_path)
+    conn.executemany(
+        "INSERT INTO ai_usage (asin, content_type, model, latency_ms, success) VALUES (?, ?, ?, ?, ?)",
+        [("B000000001", "title", "claude-test", 5000.0 + i, 1) for i in range(25)]
+        + [("B000000001", "title", "claude-test", 99999.0, 0), ("B000000001", "title", "other", 5.0, 1)]
+    )
+    conn.commit()
+    conn.close()
+    first.flush_db_writes()
+
+    system = RakutenGoldAutomationSystem()
+    backend, = system.ai_generator.backends
+    assert len(backend.stats.latencies) == 25
+    assert list(backend.stats.latencies)[-1] == pytest.approx(5.024)
+    # 起動直後から上限(30秒)ではなく記録済みのp95でヘッジする
+    assert system.ai_generator._hedge_delay(backend) == pytest.approx(5.023)
+    system.flush_db_writes()
@@ -0,0 +1,43 @@
+# tests/test_bundle.py - 一括アーカイブのテスト
+import asyncio
+import tarfile
+
+from rakuten_gold_automation import ProductInfo, RakutenGoldAutomationSystem
+
+
+def make_product(asin):
+    return ProductInfo(asin=asin, title="商品", price=1000.0, description="説明",
+                       images=["https://example.com/a.jpg"], category="Books", features=["特徴"],
+                       specifications={})
+
+
+def test_bundle_contains_only_uploaded_pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("CLAUDE_API_KEY", raising=False)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+
+    async def upload_product(rakuten_data):
+        return rakuten_data.item_url == "product-b000000001"
+
+    monkeypatch.setattr(system.rakuten_api, "upload_product", upload_product)
+    bundle = system.open_bundle("test", "tar")
+
+    async def run():
+        return await asyncio.gather(
+            system.process_asin("B000000001", product_data=make_product("B000000001"), bundle=bundle),
+            system.process_asin("B000000002", product_data=make_product("B000000002"), bundle=bundle),
+            # 実行中の処理に合流した呼び出し元からも同じページは1回だけ入る
+            system.process_asin("B000000001", product_data=make_product("B000000001"), bundle=bundle),
+        )
+
+    results = asyncio.run(run())
+    system.flush_db_writes()
+    with tarfile.open(bundle.close()) as archive:
+        names = archive.getnames()
+
+    assert [r['success'] for r in results] == [True, False, True]
+    pages = [name for name in names if name.endswith(".html")]
+    assert len(pages) == 1 and "B000000001" in pages[0]
+    assert any(name.startswith("assets/") for name in names)
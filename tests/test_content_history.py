@@ -0,0 +1,76 @@
+# tests/test_content_history.py - 生成コンテンツ履歴のテスト
+import asyncio
+import threading
+
+from rakuten_gold_automation import (
+    ContentVersionStore, GoldPageOptimizer, GoldPageStore, ProductInfo, RakutenGoldAutomationSystem,
+    RakutenGoldPageGenerator
+)
+
+PAGE = """<html>
+<head><style>.title { color: red; }</style></head>
+<body>
+    <h1 class="title">{title}</h1>
+    <p style="margin: 0">¥1,200</p>
+</body>
+</html>"""
+
+
+def test_page_history_keeps_the_unminified_render(tmp_path):
+    generator = RakutenGoldPageGenerator()
+    generator.store = GoldPageStore(tmp_path / "pages")
+    generator.optimizer = GoldPageOptimizer(generator.store)
+    store = ContentVersionStore(str(tmp_path / "test.db"))
+    generator.content_recorder = store.save
+
+    generator._finalize_page("B000000001", PAGE.replace("{title}", "旧タイトル"))
+    generator._finalize_page("B000000001", PAGE.replace("{title}", "新タイトル"))
+
+    assert store.get("B000000001", "page") == PAGE.replace("{title}", "新タイトル")
+    diff = store.diff("B000000001", "page").splitlines()
+    assert [line for line in diff if line[:1] in "+-" and line[:3] not in ("+++", "---")] == \
+        ['-    <h1 class="title">旧タイトル</h1>', '+    <h1 class="title">新タイトル</h1>']
+
+
+def test_diff_splits_single_line_html_on_tag_boundaries(tmp_path):
+    store = ContentVersionStore(str(tmp_path / "test.db"))
+    store.save("B000000001", {'description': "<div><p>説明A</p><p>共通</p></div>"})
+    store.save("B000000001", {'description': "<div><p>説明B</p><p>共通</p></div>"})
+
+    changed = [line for line in store.diff("B000000001", "description").splitlines()
+               if line[:1] in "+-" and line[:3] not in ("+++", "---")]
+    assert changed == ["-<p>説明A</p>", "+<p>説明B</p>"]
+
+
+def test_failed_generation_is_not_saved_as_a_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("CLAUDE_API_KEY", raising=False)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    system.contents.save("B000000001", {'title': "前回のタイトル"})
+
+    async def upload_product(rakuten_data):
+        return True
+
+    monkeypatch.setattr(system.rakuten_api, "upload_product", upload_product)
+    writers = []
+    save = system.contents.save
+
+    def tracking_save(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        return save(*args, **kwargs)
+
+    monkeypatch.setattr(system.contents, "save", tracking_save)
+    product = ProductInfo(asin="B000000001", title="商品", price=1000.0, description="説明",
+                          images=["https://example.com/a.jpg"], category="Books", features=["特徴"],
+                          specifications={})
+    result = asyncio.run(system.process_asin("B000000001", product_data=product))
+    system.flush_db_writes()
+
+    assert result['success']
+    # ページの履歴もDB書き込みスレッドで保存される
+    assert len(writers) == 1 and all(name.startswith("db-writer") for name in writers)
+    assert [entry['kind'] for entry in system.contents.history("B000000001")] == ['title', 'page']
+    assert system.contents.get("B000000001", "title") == "前回のタイトル"
+    assert system.contents.get("B000000001", "description") is None
@@ -0,0 +1,36 @@
+# tests/test_db_writes.py - 処理中のDB書き込みがイベントループ外で行われることのテスト
+import asyncio
+import sqlite3
+import threading
+
+import rakuten_gold_automation
+from rakuten_gold_automation import RakutenGoldAutomationSystem
+
+
+def test_ai_usage_and_log_are_written_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    
+    writer_threads = []
+    connect = sqlite3.connect
+    
+    def tracking_connect(*args, **kwargs):
+        writer_threads.append(threading.current_thread().name)
+        return connect(*args, **kwargs)
+    
+    async def run():
+        monkeypatch.setattr(rakuten_gold_automation.sqlite3, "connect", tracking_connect)
+        system._record_ai_usage(asin="B000000001", content_type="title", model="gemini-pro",
+                                input_tokens=10, output_tokens=5, latency_ms=12.0,
+                                estimated=False, success=True)
+        system._log_action("B000000001", "ai_generation", "success", "生成完了")
+    
+    asyncio.run(run())
+    system.flush_db_writes()
+    monkeypatch.setattr(rakuten_gold_automation.sqlite3, "connect", connect)
+    
+    assert writer_threads and all(name.startswith("db-writer") for name in writer_threads)
+    conn = sqlite3.connect(tmp_path / "rakuten_automation.db")
+    assert conn.execute("SELECT asin, model FROM ai_usage").fetchall() == [("B000000001", "gemini-pro")]
+    assert conn.execute("SELECT message FROM automation_log").fetchall() == [("生成完了",)]
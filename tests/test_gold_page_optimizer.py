@@ -0,0 +1,61 @@
+# tests/test_gold_page_optimizer.py - GOLDページ軽量化のテスト
+from pathlib import Path
+
+from rakuten_gold_automation import GoldPageOptimizer, GoldPageStore
+
+
+def make_optimizer(tmp_path: Path) -> GoldPageOptimizer:
+    return GoldPageOptimizer(GoldPageStore(tmp_path / "pages"))
+
+
+def test_minify_css_keeps_descendant_pseudo_selector(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    css = optimizer._minify_css(".a :hover { color : red ; }\n.b:hover , .c { margin : 0 auto ; }")
+    assert css == ".a :hover{color:red}.b:hover,.c{margin:0 auto}"
+
+
+def test_minify_css_inside_media_query(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    css = optimizer._minify_css("@media (max-width: 768px) { a :focus { outline : none ; } }")
+    assert css == "@media (max-width: 768px){a :focus{outline:none}}"
+
+
+def test_repeated_inline_styles_become_page_local_classes(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    html = ('<html><head><style>.x { color: red; }</style></head><body>'
+            '<p style="color: blue">a</p><p style="color:blue;">b</p></body></html>')
+    
+    page = optimizer.optimize("B000000001", html)
+    
+    assert page.count('class="gs-') == 2
+    assert page.count("<style>") == 1 and "{color:blue}</style>" in page
+    assets = list((tmp_path / "pages" / "assets").glob("gold_*.css"))
+    assert len(assets) == 1
+    css = assets[0].read_text(encoding="utf-8")
+    assert ".x{color:red}" in css and "gs-" not in css
+
+
+def test_caption_styles_do_not_fork_the_shared_stylesheet(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    html = ('<html><head><style>.x { color: red; }</style></head><body>{caption}</body></html>')
+    
+    pages = [
+        optimizer.optimize(f"B00000000{i}", html.replace("{caption}", f'<p style="{style}">a</p><p style="{style}">b</p>'))
+        for i, style in enumerate(["color: blue", "margin: 1px", "font-weight: bold"])
+    ]
+    
+    assert len(list((tmp_path / "pages" / "assets").glob("gold_*.css"))) == 1
+    assert len({page.split('href="')[1].split('"')[0] for page in pages}) == 1
+    assert all(page.count('class="gs-') == 2 for page in pages)
+
+
+def test_pages_from_same_template_share_stylesheet(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    html = ('<html><head><style>.x { color: red; }</style></head><body>'
+            '<p style="margin: 0">{name}</p><p style="margin: 0">x</p></body></html>')
+    
+    first = optimizer.optimize("B000000001", html.replace("{name}", "one"))
+    second = optimizer.optimize("B000000002", html.replace("{name}", "two"))
+    
+    assert len(list((tmp_path / "pages" / "assets").glob("gold_*.css"))) == 1
+    assert first.split('href="')[1].split('"')[0] == second.split('href="')[1].split('"')[0]
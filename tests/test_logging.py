@@ -0,0 +1,43 @@
+# tests/test_logging.py - 非同期ログ管理のテスト
+import json
+import logging
+import sqlite3
+
+from rakuten_gold_automation import PipelineLogManager, RakutenGoldAutomationSystem
+
+
+def test_exception_traceback_is_written_to_exc_info(tmp_path):
+    log_file = tmp_path / "app.log"
+    manager = PipelineLogManager(log_file=str(log_file), console=False).start()
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger("rakuten_gold_automation").exception("失敗: %s", "B000000001")
+    finally:
+        manager.stop()
+    
+    entry = json.loads(log_file.read_text(encoding="utf-8").splitlines()[0])
+    assert entry["message"] == "失敗: B000000001"
+    assert "ZeroDivisionError" in entry["exc_info"]
+
+
+def test_audit_log_does_not_depend_on_logger_level(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = PipelineLogManager(log_file=str(tmp_path / "app.log"), console=False).start()
+    module_logger = logging.getLogger("rakuten_gold_automation")
+    previous_level = module_logger.level
+    try:
+        system = RakutenGoldAutomationSystem()
+        module_logger.setLevel(logging.WARNING)
+        system._log_action("B000000001", "fetch_amazon_data", "success", "取得完了")
+    finally:
+        module_logger.setLevel(previous_level)
+        manager.stop()
+    
+    rows = sqlite3.connect(tmp_path / "rakuten_automation.db").execute(
+        "SELECT asin, action, status, message FROM automation_log"
+    ).fetchall()
+    assert rows == [("B000000001", "fetch_amazon_data", "success", "取得完了")]
+    # 監査専用レコードはファイルログには出ない
+    assert "取得完了" not in (tmp_path / "app.log").read_text(encoding="utf-8")
@@ -0,0 +1,61 @@
+# tests/test_preview_server.py - テンプレートプレビューサーバーのテスト
+from rakuten_gold_automation import (
+    ProductInfo, ProductSnapshotStore, RakutenProductData, TemplatePreviewServer
+)
+
+TEMPLATE = """<html><head><style>.title { color: red; }</style></head>
+<body><h1 class="title">{item_name}</h1><img src="{main_image}">
+<p style="margin: 0">{item_price}</p><p style="margin: 0">{current_date}</p></body></html>"""
+
+
+def save_snapshot(db_path, asin="B000000001"):
+    product = ProductInfo(asin=asin, title="テスト商品", price=1000.0, description="説明",
+                          images=["https://example.com/a.jpg"], category="Books",
+                          features=["特徴"], specifications={"サイズ": "M"})
+    rakuten = RakutenProductData(item_name="楽天タイトル", item_price=1200, item_caption="説明",
+                                 category_id="101240", item_url=f"product-{asin.lower()}",
+                                 images=product.images, delivery_flag=1, postage_flag=0, tax_flag=1)
+    ProductSnapshotStore(str(db_path)).save(product, rakuten)
+
+
+def make_server(tmp_path):
+    template = tmp_path / "template.html"
+    template.write_text(TEMPLATE, encoding="utf-8")
+    return TemplatePreviewServer(db_path=str(tmp_path / "test.db"), template_path=str(template))
+
+
+def test_preview_applies_production_optimizer_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = make_server(tmp_path)
+    save_snapshot(tmp_path / "test.db")
+    
+    page = server.render("B000000001")
+    
+    assert 'rel="stylesheet"' in page and 'class="gs-' in page
+    assert ".title" not in page.split('</head>')[0]
+    assert 'width="500" height="500"' in page
+    assert len(server.assets.assets) == 1
+    assert not (tmp_path / "preview").exists()
+
+
+def test_missing_snapshot_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = make_server(tmp_path)
+    
+    assert "スナップショットがありません" in server.render("B000000001")
+    save_snapshot(tmp_path / "test.db")
+    assert "楽天タイトル" in server.render("B000000001")
+
+
+def test_template_error_is_escaped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = make_server(tmp_path)
+    save_snapshot(tmp_path / "test.db")
+    
+    def broken(*args):
+        raise ValueError("<script>alert(1)</script>")
+    monkeypatch.setattr(server.page_generator, "render_gold_page", broken)
+    
+    page = server.render("B000000001")
+    assert "<script>alert" not in page
+    assert "&lt;script&gt;" in page
@@ -0,0 +1,101 @@
+# tests/test_pricing.py - 価格ルールエンジン・再価格計算のテスト
+import asyncio
+import json
+import sqlite3
+
+from rakuten_gold_automation import (
+    PricingRuleEngine, ProductInfo, ProductSnapshotStore, RakutenGoldAutomationSystem, RakutenProductData
+)
+
+
+def test_default_rules_match_truncated_twenty_percent_margin():
+    engine = PricingRuleEngine(rules={})
+    costs = [50, 999, 1000, 1234.5, 3333.33, 19800]
+
+    assert [engine.price(cost) for cost in costs] == [int(cost * 1.2) for cost in costs]
+    assert engine.price(0) == 0
+
+
+def test_price_endings_are_opt_in():
+    engine = PricingRuleEngine(rules={'price_endings': [80, 98]})
+
+    assert engine.price(1000) == 1280
+    assert engine.price(1070) == 1298
+    assert engine.price(50) == 80
+
+
+def save_listed_product(system, asin, cost, price):
+    product = ProductInfo(asin=asin, title="商品", price=cost, description="", images=[], category="Books",
+                          features=[], specifications={})
+    rakuten = RakutenProductData(item_name="商品", item_price=price, item_caption="", category_id="101240",
+                                 item_url=f"product-{asin.lower()}", images=[], delivery_flag=1,
+                                 postage_flag=0, tax_flag=1)
+    ProductSnapshotStore(system.db_path).save(product, rakuten)
+    system._update_product_status(asin, rakuten.item_url, "completed", price)
+
+
+def test_reprice_updates_listed_prices_and_syncs_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    save_listed_product(system, "B000000001", 1000, 1200)
+    save_listed_product(system, "B000000002", 2000, 2400)
+
+    engine = PricingRuleEngine(rules={'categories': {'Books': {'margin_tiers': [[0, 0.30]]}}})
+    assert len(engine.reprice_catalog(system.db_path, dry_run=True)) == 2
+    assert system.get_processing_status()['price_pending'] == 0
+
+    changed = engine.reprice_catalog(system.db_path)
+    assert changed['new_price'].tolist() == [1300, 2600]
+
+    conn = sqlite3.connect(system.db_path)
+    assert conn.execute("SELECT asin, rakuten_price, price_pending FROM processed_products ORDER BY asin").fetchall() == \
+        [("B000000001", 1300, 1), ("B000000002", 2600, 1)]
+    # プレビュー用スナップショットは書き換えない
+    snapshot = conn.execute("SELECT rakuten_json FROM product_snapshots WHERE asin = 'B000000001'").fetchone()[0]
+    assert json.loads(snapshot)['item_price'] == 1200
+    conn.close()
+
+    pushed = []
+
+    async def fake_update_item_price(item_url, item_price, session=None):
+        pushed.append((item_url, item_price))
+        return item_url == "product-b000000001"
+
+    monkeypatch.setattr(system.rakuten_api, "update_item_price", fake_update_item_price)
+    counts = asyncio.run(system.sync_prices())
+
+    assert sorted(pushed) == [("product-b000000001", 1300), ("product-b000000002", 2600)]
+    assert counts == {'pending': 2, 'synced': 1, 'failed': 1}
+    assert system.get_processing_status()['price_pending'] == 1
+    # 再計算結果が変わらなければ二度目は変更なし
+    assert engine.reprice_catalog(system.db_path).empty
+
+
+def test_sync_prices_keeps_in_flight_pushes_within_scheduler_capacity(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    for i in range(30):
+        save_listed_product(system, f"B{i:09d}", 1000, 1200)
+    PricingRuleEngine(rules={'default': {'margin_tiers': [[0, 0.50]]}}).reprice_catalog(system.db_path)
+
+    state = {'running': 0, 'peak': 0, 'sessions': set()}
+
+    async def fake_update_item_price(item_url, item_price, session=None):
+        state['sessions'].add(id(session))
+        state['running'] += 1
+        state['peak'] = max(state['peak'], state['running'])
+        async with system.schedulers['rakuten'].slot():
+            await asyncio.sleep(0.001)
+        state['running'] -= 1
+        return True
+
+    monkeypatch.setattr(system.rakuten_api, "update_item_price", fake_update_item_price)
+    counts = asyncio.run(system.sync_prices())
+
+    assert counts == {'pending': 30, 'synced': 30, 'failed': 0}
+    assert state['peak'] <= system.concurrency['rakuten'].max_limit
+    assert state['peak'] < 30
+    assert len(state['sessions']) == 1
+    assert system.get_processing_status()['price_pending'] == 0
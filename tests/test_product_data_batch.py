@@ -0,0 +1,155 @@
+# tests/test_product_data_batch.py - 商品データのバッチ取得（代替サーバー使用）のテスト
+import asyncio
+import json
+import threading
+
+import pytest
+
+from rakuten_gold_automation import (
+    AmazonDataCollector, ProductDataStandInServer, RakutenGoldAutomationSystem
+)
+
+ASINS = [f"B00000000{i}" for i in range(1, 6)]
+
+
+@pytest.fixture
+def standin():
+    server = ProductDataStandInServer(port=0, max_batch_size=2)
+    httpd = server.create_server()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_collector(server, max_batch_size=2, prefetch_chunks=4):
+    return AmazonDataCollector(api_key="test", base_url=f"http://{server.host}:{server.port}/v1",
+                               max_batch_size=max_batch_size, prefetch_chunks=prefetch_chunks)
+
+
+async def collect(collector, asins):
+    return [item async for item in collector.iter_products(asins)]
+
+
+def test_asins_are_split_into_chunks_and_ndjson_is_parsed(standin):
+    items = asyncio.run(collect(make_collector(standin), ASINS))
+
+    assert sorted(standin.batch_sizes) == [1, 2, 2]
+    assert sorted(asin for asin, _, _ in items) == ASINS
+    for asin, product, error in items:
+        assert error is None
+        assert product.asin == asin
+        assert product.title == f"テスト商品 {asin}"
+        assert product.price == standin.lookup(asin)['price']['value']
+        assert product.specifications['型番'] == asin
+
+
+def test_not_found_is_reported_per_asin(standin):
+    items = dict((asin, (product, error)) for asin, product, error in
+                 asyncio.run(collect(make_collector(standin), ["B000000001", "UNKNOWN"])))
+
+    assert items["B000000001"][1] is None
+    assert items["UNKNOWN"] == (None, "not_found")
+    assert standin.batch_sizes == [2]
+
+
+def test_chunks_are_fetched_as_the_consumer_reads(standin):
+    async def run():
+        collector = make_collector(standin, prefetch_chunks=1)
+        iterator = collector.iter_products(ASINS)
+        await iterator.__anext__()
+        requested = list(standin.batch_sizes)
+        rest = [item async for item in iterator]
+        return requested, rest
+
+    requested, rest = asyncio.run(run())
+    assert requested == [2]
+    assert len(rest) == len(ASINS) - 1
+    assert standin.batch_sizes == [2, 2, 1]
+
+
+def test_oversized_batch_falls_back_to_single_fetch(standin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    system.amazon_collector.base_url = f"http://{standin.host}:{standin.port}/v1"
+    system.amazon_collector.max_batch_size = 3
+
+    calls = {}
+
+    async def fake_process_asin(asin, product_data=None, priority='interactive', bundle=None):
+        if product_data is None:
+            # process_asin内の個別取得と同じ経路
+            product_data = await system.amazon_collector.fetch_product_data(asin)
+            calls[asin] = 'single'
+        else:
+            calls[asin] = 'batch'
+        return dict(system._new_result(asin), success=product_data is not None)
+
+    monkeypatch.setattr(system, "process_asin", fake_process_asin)
+    results = asyncio.run(system.bulk_process_asins(["B000000001", "B000000002", "UNKNOWN", "B000000001"]))
+    system.flush_db_writes()
+
+    assert standin.batch_sizes == [3]
+    assert calls == {"B000000001": 'single', "B000000002": 'single', "UNKNOWN": 'single'}
+    assert [r['success'] for r in results] == [True, True, False, True]
+
+
+def test_not_found_in_batch_is_not_refetched(standin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+    system.amazon_collector.base_url = f"http://{standin.host}:{standin.port}/v1"
+    system.amazon_collector.max_batch_size = 2
+
+    calls = []
+
+    async def fake_process_asin(asin, product_data=None, priority='interactive', bundle=None):
+        calls.append((asin, product_data is not None))
+        return dict(system._new_result(asin), success=True)
+
+    monkeypatch.setattr(system, "process_asin", fake_process_asin)
+    results = asyncio.run(system.bulk_process_asins(["B000000001", "UNKNOWN"]))
+    system.flush_db_writes()
+
+    assert calls == [("B000000001", True)]
+    miss = next(r for r in results if r['asin'] == "UNKNOWN")
+    assert miss['success'] is False
+    assert miss['error_class'] == "not_found"
+
+
+def test_stream_broken_partway_reports_only_unsent_asins(standin):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class BrokenStreamHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            body = (json.dumps(standin.lookup("B000000001")) + "\n{broken\n").encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), BrokenStreamHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        collector = AmazonDataCollector(api_key="test", base_url=f"http://127.0.0.1:{httpd.server_address[1]}/v1",
+                                        max_batch_size=3)
+        items = asyncio.run(collect(collector, ["B000000001", "B000000002", "B000000003"]))
+        products, misses = asyncio.run(collector.fetch_products_bulk(["B000000001", "B000000002", "B000000003"]))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert [asin for asin, _, _ in items].count("B000000001") == 1
+    assert items[0][0] == "B000000001" and items[0][1] is not None
+    assert sorted(asin for asin, _, error in items if error and error.startswith("batch_error")) == \
+        ["B000000002", "B000000003"]
+    assert list(products) == ["B000000001"]
+    assert sorted(misses) == ["B000000002", "B000000003"]
@@ -0,0 +1,69 @@
+# tests/test_profiler.py - 実行プロファイラのテスト
+import csv
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from rakuten_gold_automation import RunProfiler
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def busy_work(duration=0.1):
+    """サンプリングに引っかかる程度のCPU処理とメモリ確保"""
+    end = time.perf_counter() + duration
+    data = []
+    while time.perf_counter() < end:
+        data.append("x" * 1000)
+        sum(i * i for i in range(1000))
+    return len(data)
+
+
+def test_profiler_writes_all_outputs(tmp_path):
+    profiler = RunProfiler(tmp_path / "run", sample_interval=0.001, max_snapshots=3)
+    profiler.start()
+    for i in range(5):
+        busy_work(0.02)
+        profiler.mark(f"B00000000{i}", "ai_generation", "success")
+    output_dir = profiler.stop()
+
+    assert output_dir == tmp_path / "run"
+    assert (output_dir / "profile.pstats").stat().st_size > 0
+    assert "busy_work" in (output_dir / "profile.txt").read_text(encoding="utf-8")
+
+    lines = (output_dir / "flamegraph.collapsed").read_text(encoding="utf-8").splitlines()
+    assert lines
+    # 末尾の空白以降がサンプル数（フレーム名には空白を含むことがある: "<frozen importlib._bootstrap>"）
+    assert all(re.fullmatch(r"[^;]+(;[^;]+)* \d+", line) for line in lines)
+    assert any("test_profiler.py:busy_work" in line for line in lines)
+
+    with open(output_dir / "memory.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    # 開始・5回のmark・終了
+    assert len(rows) == 7
+    assert [row['stage'] for row in rows[1:-1]] == ["ai_generation"] * 5
+    assert all(int(row['peak_bytes']) >= int(row['current_bytes']) for row in rows)
+
+    # スナップショットは max_snapshots 件まで
+    snapshots = sorted((output_dir / "tracemalloc").glob("*.snap"))
+    assert [path.name[:4] for path in snapshots] == ["0001", "0002", "0003"]
+    assert (output_dir / "memory_top.txt").exists()
+
+
+def test_cli_profile_option_writes_run_directory(tmp_path):
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('PRODUCT_DATA_API_KEY', 'GEMINI_API_KEY', 'RAKUTEN_SERVICE_SECRET', 'RAKUTEN_LICENSE_KEY')}
+    completed = subprocess.run(
+        [sys.executable, str(REPO_ROOT / "main.py"), "cli", "--asin", "B000000001", "--profile"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    run_dirs = list((tmp_path / "output" / "results").iterdir())
+    assert len(run_dirs) == 1
+    for name in ("profile.pstats", "flamegraph.collapsed", "memory.csv"):
+        assert (run_dirs[0] / name).exists()
+    assert str(run_dirs[0].name) in completed.stdout
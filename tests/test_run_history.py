@@ -0,0 +1,110 @@
+# tests/test_run_history.py - 実行履歴ストアのテスト
+import sys
+from datetime import datetime
+
+import pytest
+
+import rakuten_gold_automation
+from rakuten_gold_automation import RunHistoryStore, new_run_id
+
+
+def make_result(asin, success, category='Books', error_class='', amazon_price=1000.0, rakuten_price=1200,
+                total_ms=100.0):
+    return {
+        'asin': asin, 'success': success, 'message': '' if success else '失敗',
+        'error_class': error_class, 'category': category,
+        'amazon_price': amazon_price, 'rakuten_price': rakuten_price if success else None,
+        'timings': {'fetch_amazon_data': 10.0, 'ai_generation': 50.0, 'total': total_ms},
+    }
+
+
+def append_on(monkeypatch, store, day, run_id, results):
+    """指定日の実行として履歴に追記"""
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(f"{day}T12:00:00")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(rakuten_gold_automation, "datetime", FixedDatetime)
+        return store.append(run_id, results)
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    store = RunHistoryStore(tmp_path / "history")
+    append_on(monkeypatch, store, "2025-08-01", "run1", [
+        make_result("B000000001", True, total_ms=100.0),
+        make_result("B000000002", False, error_class='upload_failed', total_ms=300.0),
+        make_result("B000000003", True, category='Electronics', amazon_price=2000.0, rakuten_price=2400),
+    ])
+    append_on(monkeypatch, store, "2025-08-03", "run2", [
+        make_result("B000000001", True),
+        make_result("B000000004", False, category='', error_class='not_found'),
+    ])
+    return store
+
+
+def test_runs_started_in_the_same_second_do_not_overwrite_each_other(tmp_path):
+    store = RunHistoryStore(tmp_path / "history")
+    result = {'asin': "B000000001", 'success': True, 'timings': {}}
+
+    run_ids = {new_run_id() for _ in range(20)}
+    paths = {store.append(run_id, [result]) for run_id in run_ids}
+
+    assert len(run_ids) == 20
+    assert len(paths) == 20 and all(path.exists() for path in paths)
+    assert sorted(store.load()['run_id']) == sorted(run_ids)
+
+
+def test_runs_are_partitioned_by_run_date_and_timings_are_mapped(history):
+    partitions = sorted(path.name for path in history.root.iterdir())
+    assert partitions == ["run_date=2025-08-01", "run_date=2025-08-03"]
+
+    df = history.load()
+    row = df[(df['run_id'] == "run1") & (df['asin'] == "B000000002")].iloc[0]
+    assert row['run_date'] == "2025-08-01"
+    assert (row['fetch_ms'], row['ai_ms'], row['total_ms']) == (10.0, 50.0, 300.0)
+    assert row['page_ms'] != row['page_ms'] and row['upload_ms'] != row['upload_ms']  # NaN
+
+
+def test_report_aggregates_all_runs(history):
+    report = history.report()
+
+    assert report['rows'] == 5
+    assert report['runs'] == 2
+    assert report['unique_asins'] == 4
+    assert report['success_rate'] == pytest.approx(3 / 5)
+    assert report['by_run'].loc["run1", 'asins'] == 3
+    assert report['by_run'].loc["run1", 'success_rate'] == pytest.approx(2 / 3)
+    assert report['errors'].to_dict() == {'upload_failed': 1, 'not_found': 1}
+
+    books = report['by_category'].loc['Books']
+    assert books['asins'] == 2
+    assert books['success_rate'] == pytest.approx(2 / 3)
+    assert books['avg_rakuten_price'] == pytest.approx(1200)
+    assert report['by_category'].loc['Electronics', 'avg_amazon_price'] == pytest.approx(2000.0)
+    assert '' not in report['by_category'].index
+    assert report['timings'].loc['total_ms', 'max'] == pytest.approx(300.0)
+
+
+def test_report_since_filters_partitions(history):
+    report = history.report(since="2025-08-02")
+
+    assert report['rows'] == 2
+    assert report['runs'] == 1
+    assert report['success_rate'] == pytest.approx(0.5)
+    assert report['errors'].to_dict() == {'not_found': 1}
+    assert history.report(since="2025-09-01") == {'rows': 0}
+
+
+def test_csv_is_written_when_pandas_is_unavailable(tmp_path, monkeypatch):
+    store = RunHistoryStore(tmp_path / "history")
+    with monkeypatch.context() as patch:
+        patch.setitem(sys.modules, "pandas", None)
+        path = store.append("run1", [make_result("B000000001", True)])
+
+    assert path.suffix == ".csv"
+    df = store.load()
+    assert df['asin'].tolist() == ["B000000001"]
+    assert df['total_ms'].tolist() == [100.0]
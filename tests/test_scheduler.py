@@ -0,0 +1,98 @@
+# tests/test_scheduler.py - 優先度スケジューラのテスト
+import asyncio
+
+from rakuten_gold_automation import (
+    ExecutionPriority, PriorityScheduler, RakutenGoldAutomationSystem, current_priority
+)
+
+
+async def hold_and_queue(scheduler, priorities):
+    """枠を1つ占有したまま各優先度の処理を並べ、枠が割り当てられた順を返す"""
+    order = []
+    await scheduler.acquire('interactive')
+
+    async def worker(label, priority):
+        async with scheduler.slot(priority):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.ensure_future(worker(label, priority)) for label, priority in priorities]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_interactive_requests_are_served_before_queued_bulk_requests():
+    scheduler = PriorityScheduler('test', capacity=1, aging_per_sec=0.0)
+    priorities = [(f"bulk{i}", 'bulk') for i in range(4)] + [(f"interactive{i}", 'interactive') for i in range(4)]
+    order = asyncio.run(hold_and_queue(scheduler, priorities))
+
+    assert order[:5] == ["bulk0", "interactive0", "interactive1", "interactive2", "interactive3"]
+    assert scheduler.stats()['granted'] == {'interactive': 5, 'bulk': 4, 'background': 0}
+
+
+def test_bulk_is_not_starved_by_continuous_interactive_load():
+    scheduler = PriorityScheduler('test', capacity=1, aging_per_sec=0.0)
+    priorities = [("bulk", 'bulk')] + [(f"interactive{i}", 'interactive') for i in range(40)]
+    order = asyncio.run(hold_and_queue(scheduler, priorities))
+
+    # 重み16:4 なので対話的処理が続いていても一括処理は数回に1回は枠を得る
+    assert order.index("bulk") < 5
+
+
+def test_promoted_execution_moves_to_the_interactive_queue():
+    async def run():
+        scheduler = PriorityScheduler('test', capacity=1, aging_per_sec=0.0)
+        order = []
+        await scheduler.acquire('bulk')
+
+        async def worker(label, execution):
+            current_priority.set(execution)
+            async with scheduler.slot():
+                order.append(label)
+
+        first = ExecutionPriority('bulk')
+        promoted = ExecutionPriority('bulk')
+        tasks = [asyncio.ensure_future(worker("first", first)),
+                 asyncio.ensure_future(worker("promoted", promoted))]
+        await asyncio.sleep(0)
+        assert scheduler.stats()['waiting']['bulk'] == 2
+
+        assert promoted.promote('interactive')
+        assert not promoted.promote('bulk')
+        assert scheduler.stats()['waiting'] == {'interactive': 1, 'bulk': 1, 'background': 0}
+
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["promoted", "first"]
+
+
+def test_interactive_caller_promotes_in_flight_bulk_execution(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = RakutenGoldAutomationSystem()
+    system.log_manager = None
+
+    async def run():
+        release = asyncio.Event()
+        seen = []
+
+        async def fake_process_asin(asin, product_data, execution):
+            await release.wait()
+            seen.append(execution.name)
+            return dict(system._new_result(asin), success=True)
+
+        monkeypatch.setattr(system, "_process_asin", fake_process_asin)
+        bulk = asyncio.ensure_future(system.process_asin("B000000001", priority='bulk'))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(system.process_asin("b000000001", priority='interactive'))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(bulk, interactive)
+        return seen
+
+    assert asyncio.run(run()) == ['interactive']
+    assert system._inflight.coalesced == 1
+    system.flush_db_writes()
@@ -0,0 +1,60 @@
+# tests/test_single_flight.py - 同一キーの同時実行まとめのテスト
+import asyncio
+
+from rakuten_gold_automation import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+        
+        results = await asyncio.gather(*(flight.do("B000000001", work) for _ in range(5)))
+        return flight, calls, results
+    
+    flight, calls, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"value": 42} for result in results)
+    assert flight.coalesced == 4
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately_and_key_is_released():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+        
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+        
+        await asyncio.gather(flight.do("A", lambda: work("A")), flight.do("B", lambda: work("B")))
+        await flight.do("A", lambda: work("A"))
+        return calls
+    
+    assert asyncio.run(run()) == ["A", "B", "A"]
+
+
+def test_cancelled_caller_does_not_cancel_shared_execution():
+    async def run():
+        flight = SingleFlight()
+        finished = asyncio.Event()
+        
+        async def work():
+            await asyncio.sleep(0.02)
+            finished.set()
+            return "done"
+        
+        first = asyncio.ensure_future(flight.do("A", work))
+        second = asyncio.ensure_future(flight.do("A", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, finished.is_set()
+    
+    assert asyncio.run(run()) == ("done", True)
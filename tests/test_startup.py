@@ -0,0 +1,29 @@
+# tests/test_startup.py - モード別の起動時間予算（STARTUP_BUDGETS）のテスト
+import subprocess
+import sys
+
+import pytest
+
+import main
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("mode", sorted(main.STARTUP_BUDGETS))
+def test_import_time_is_within_budget(mode):
+    modules, budget_ms = main.STARTUP_BUDGETS[mode]
+
+    # main.py bench と同じく初回（バイトコード生成）を除いた最小値で判定
+    main.measure_import_time(modules)
+    elapsed_ms = min(main.measure_import_time(modules) for _ in range(3))
+
+    assert elapsed_ms <= budget_ms, f"{mode}: {elapsed_ms:.1f} ms > {budget_ms} ms"
+
+
+@pytest.mark.slow
+def test_heavy_libraries_are_not_imported_at_startup():
+    code = ("import sys, main, rakuten_gold_automation; "
+            "print(' '.join(m for m in ('aiohttp', 'google.generativeai', 'pandas') if m in sys.modules))")
+    proc = subprocess.run([sys.executable, '-c', code], cwd=str(main.project_root),
+                          capture_output=True, text=True, check=True)
+
+    assert proc.stdout.strip() == ""